@@ -1,13 +1,29 @@
 # assistant.py - The Final Version with First-Move Suggestion
 
-import pyautogui
+import argparse
 import cv2
 import numpy as np
 import chess
-import chess.engine
 import os
-import time
 import logging
+import threading
+from template_store import TemplateStore
+from theme_pack import load_pack
+from capture import create_capture
+from metrics import METRICS, PROFILE
+from analysis import StopConditions, analyse
+from analysis_cache import AnalysisCache
+from lookup import Lookup
+from pipeline import AnalysisWorker
+from scheduler import CaptureScheduler
+from game_session import GameSession
+from time_manager import TimeManager
+from clock import ClockReader
+from classifier_pool import ClassifierPool
+from batch_classifier import (BatchClassifier, IncrementalClassifier, split_squares, labels_to_fen,
+                              confidence_margins)
+from stabilizer import PositionStabilizer
+from cascade_classifier import CascadeClassifier
 
 # -----------------------------------------------------------------------------------
 # --- CONFIGURATION ---
@@ -25,6 +41,96 @@ CONFIDENCE_THRESHOLD = 0.3
 
 CAPTURE_INTERVAL = 1.5
 STOCKFISH_THINK_TIME = 5.0
+
+# The game is sent to Stockfish with its move history, so the hash table keeps
+# paying off from one move to the next. None leaves an option at its default.
+STOCKFISH_THREADS = 2
+STOCKFISH_HASH_MB = 256
+
+# The board is polled through a small perceptual hash every CAPTURE_POLL_INTERVAL
+# seconds; recognition runs once a change has held for CAPTURE_DEBOUNCE seconds.
+# After CAPTURE_IDLE_AFTER idle seconds polling slows down to CAPTURE_INTERVAL.
+CAPTURE_POLL_INTERVAL = 0.05
+CAPTURE_DEBOUNCE = 0.15
+CAPTURE_IDLE_AFTER = 30.0
+
+# How many plies may pass between two captures and still be reconstructed.
+MAX_GAP_PLIES = 3
+
+# A new position is only acted on once every changed square has settled: its confidence
+# margin is at least STABILIZER_MARGIN or its last STABILIZER_FRAMES readings agree.
+# Unsettled squares are re-read every STABILIZER_RECHECK seconds. 1 frame disables it.
+STABILIZER_FRAMES = 3
+STABILIZER_MARGIN = 0.15
+STABILIZER_RECHECK = 0.1
+
+# Analysis streams depth by depth and stops early once the best move and eval hold
+# (within ANALYSIS_STABLE_MARGIN centipawns) for ANALYSIS_STABLE_ITERATIONS depths
+# past ANALYSIS_MIN_DEPTH.
+ANALYSIS_MAX_DEPTH = 30
+ANALYSIS_MIN_DEPTH = 10
+ANALYSIS_STABLE_ITERATIONS = 4
+ANALYSIS_STABLE_MARGIN = 15
+
+# STOCKFISH_THINK_TIME is the normal budget. A single legal move gets TIME_FORCED
+# seconds and at most TIME_FEW_MOVES legal moves half the budget. A search stops
+# once its best line leads the second by TIME_CLEAR_GAP centipawns, and may run
+# to TIME_EXTEND times the budget while the best move or eval (by more than
+# TIME_UNSTABLE_MARGIN centipawns) keeps changing.
+TIME_FORCED = 0.1
+TIME_FEW_MOVES = 4
+TIME_CLEAR_GAP = 150
+TIME_EXTEND = 2.5
+TIME_UNSTABLE_MARGIN = 40
+
+# Set CLOCK_REGION to the (x, y, w, h) of your clock to read it before each of your
+# moves; CLOCK_DIGITS_PATH holds 0.png ... 9.png cropped from that clock. No search
+# then takes more than CLOCK_FRACTION of the time left.
+CLOCK_REGION = None
+CLOCK_DIGITS_PATH = "clock_digits/"
+CLOCK_FRACTION = 0.05
+
+# Finished analyses are cached by position (in memory and in this SQLite file).
+# Results at least ANALYSIS_CACHE_DEPTH deep are reused without asking the engine.
+ANALYSIS_CACHE_PATH = "analysis_cache.sqlite3"
+ANALYSIS_CACHE_SIZE = 10000
+ANALYSIS_CACHE_DEPTH = 20
+
+# Stage latencies and counters. When enabled, a JSON snapshot is written every
+# METRICS_INTERVAL seconds and, if METRICS_PORT is set, served as text on 127.0.0.1.
+METRICS_ENABLED = False
+METRICS_SNAPSHOT_PATH = "metrics.json"
+METRICS_INTERVAL = 30.0
+METRICS_PORT = None
+
+# While the opponent thinks, predict their PONDER_REPLIES likeliest replies (searching
+# PONDER_PREDICT_TIME seconds) and analyse our answer to each ahead of time. 0 disables.
+PONDER_REPLIES = 3
+PONDER_PREDICT_TIME = 0.3
+
+# Optional polyglot opening book (.bin) and Syzygy tablebase folder. Positions they
+# know are answered from them instantly instead of by the engine. None disables.
+OPENING_BOOK_PATH = None
+SYZYGY_PATH = None
+
+# Number of distinct square sizes to keep pre-scaled templates for.
+TEMPLATE_CACHE_SIZE = 4
+
+# Squares can be classified on RECOGNITION_WORKERS threads (None = one per core, 1 = off)
+# once a batch has RECOGNITION_MIN_WORK pixels. "process" uses worker processes instead.
+# Off by default; enable it only where benchmark.py shows classify_parallel winning.
+RECOGNITION_WORKERS = 1
+RECOGNITION_BACKEND = "thread"
+RECOGNITION_MIN_WORK = 32768
+
+# Squares whose mean pixel difference stays below this keep their previous label.
+# Every FULL_REFRESH_FRAMES frames all 64 squares are reclassified anyway.
+SQUARE_CHANGE_THRESHOLD = 8.0
+FULL_REFRESH_FRAMES = 20
+
+# "mss" grabs the live screen; "replay" reads frames from CAPTURE_REPLAY_PATH instead.
+CAPTURE_BACKEND = "mss"
+CAPTURE_REPLAY_PATH = "debug/"
 # -----------------------------------------------------------------------------------
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s -[%(levelname)s]- %(message)s')
@@ -33,19 +139,53 @@ class ChessAssistant:
     def __init__(self, config):
         self.config = config
         self.board_region = None
+        self.capture = create_capture(config.get('CAPTURE_BACKEND', 'mss'), config.get('CAPTURE_REPLAY_PATH'))
         self.engine = None
-        self.piece_templates = {}
-        self.template_masks = {}
-        self.internal_board = chess.Board()
+        self.analysis_worker = None
+        self.analysis_cache = None
+        self.lookup = None
+        self._stockfish_thread = None
+        self._stockfish_ready = False
+        self.stop_conditions = TimeManager(
+            StopConditions(max_time=config['STOCKFISH_THINK_TIME'], max_depth=config.get('ANALYSIS_MAX_DEPTH'),
+                           stable_iterations=config.get('ANALYSIS_STABLE_ITERATIONS'),
+                           stable_margin=config.get('ANALYSIS_STABLE_MARGIN', 15),
+                           min_depth=config.get('ANALYSIS_MIN_DEPTH', 8)),
+            config.get('TIME_FORCED', 0.1), config.get('TIME_FEW_MOVES', 4), config.get('TIME_EXTEND', 2.5),
+            config.get('TIME_CLEAR_GAP', 150), config.get('TIME_UNSTABLE_MARGIN', 40),
+            config.get('CLOCK_FRACTION', 0.05))
+        self.clock = None
+        self.ponder_stop = StopConditions(max_time=config.get('PONDER_PREDICT_TIME', 0.3),
+                                          max_depth=config.get('ANALYSIS_MAX_DEPTH'))
+        self.templates = TemplateStore(config.get('TEMPLATE_CACHE_SIZE', 4))
+        self.pool = ClassifierPool(config.get('RECOGNITION_WORKERS'), config.get('RECOGNITION_BACKEND', 'thread'),
+                                   config.get('RECOGNITION_MIN_WORK', 32768))
+        self.classifier = BatchClassifier(self.templates, self.pool)
+        self.cascade = CascadeClassifier(self.classifier)
+        self.incremental = IncrementalClassifier(
+            self.cascade, config.get('SQUARE_CHANGE_THRESHOLD', 8.0), config.get('FULL_REFRESH_FRAMES', 20))
+        self.last_scores = None
+        self.last_confidence = None
+        self.stabilizer = PositionStabilizer(config.get('STABILIZER_FRAMES', 3), config.get('STABILIZER_MARGIN', 0.15))
+        self.session = GameSession()
         self.is_playing_as_black = False
 
     def setup(self):
-        """Runs all necessary setup functions."""
-        return self._load_templates() and self._init_stockfish() and self._select_board_region()
+        """Runs all necessary setup functions. Stockfish starts in the background meanwhile."""
+        self._start_stockfish_in_background()
+        with PROFILE.step("load templates"):
+            loaded = self._load_templates()
+        selected = loaded and self._select_board_region()
+        return self._wait_for_stockfish() and selected
             
     def _load_templates(self):
-        """Loads piece templates and their transparency masks."""
+        """Loads piece templates and their transparency masks, from the compiled theme pack if there is one."""
         theme_path = self.config['PIECE_THEME']
+        pack = load_pack(theme_path)
+        if pack is not None and len(pack.codes) >= 12:
+            self.templates.load_pack(pack)
+            logging.info(f"Loaded {len(self.templates)} templates from the theme pack.")
+            return True
         logging.info(f"Loading piece templates from: {theme_path}")
         try:
             for filename in os.listdir(theme_path):
@@ -56,12 +196,11 @@ class ChessAssistant:
                     if template_rgba is None or template_rgba.shape[2] != 4:
                         logging.error(f"Template '{filename}' is not a valid PNG with transparency. Please recapture it.")
                         return False
-                    self.template_masks[piece_code] = template_rgba[:, :, 3]
-                    self.piece_templates[piece_code] = template_rgba[:, :, :3]
-            if len(self.piece_templates) < 12:
+                    self.templates.add(piece_code, template_rgba[:, :, :3], template_rgba[:, :, 3])
+            if len(self.templates) < 12:
                 logging.error(f"Failed to load all 12 templates from '{theme_path}'.")
                 return False
-            logging.info(f"Successfully loaded {len(self.piece_templates)} templates with masks.")
+            logging.info(f"Successfully loaded {len(self.templates)} templates with masks.")
             return True
         except Exception as e:
             logging.error(f"Error loading templates from '{theme_path}': {e}")
@@ -70,19 +209,43 @@ class ChessAssistant:
     def _init_stockfish(self):
         """Initializes the Stockfish engine."""
         try:
-            self.engine = chess.engine.SimpleEngine.popen_uci(self.config['STOCKFISH_PATH'])
+            with PROFILE.step("import chess.engine"):
+                # Loads asyncio; kept off the start-up path by running on the background thread.
+                import chess.engine
+            with PROFILE.step("launch engine"):
+                self.engine = chess.engine.SimpleEngine.popen_uci(self.config['STOCKFISH_PATH'])
+                options = {"Threads": self.config.get('STOCKFISH_THREADS'), "Hash": self.config.get('STOCKFISH_HASH_MB')}
+                self.engine.configure({name: value for name, value in options.items()
+                                       if value is not None and name in self.engine.options})
+            self.analysis_cache = AnalysisCache(self.config.get('ANALYSIS_CACHE_PATH'),
+                                                self.config.get('ANALYSIS_CACHE_SIZE', 10000),
+                                                self.config.get('ANALYSIS_CACHE_DEPTH', 20))
+            self.lookup = Lookup(self.config.get('OPENING_BOOK_PATH'), self.config.get('SYZYGY_PATH'))
             logging.info("Stockfish engine initialized successfully.")
             return True
         except Exception as e:
             logging.error(f"Failed to initialize Stockfish: {e}")
             return False
 
+    def _start_stockfish_in_background(self):
+        """Runs _init_stockfish() on a thread so the engine loads while the user selects the region."""
+        def run():
+            self._stockfish_ready = self._init_stockfish()
+        self._stockfish_thread = threading.Thread(target=run, name="engine-startup", daemon=True)
+        self._stockfish_thread.start()
+
+    def _wait_for_stockfish(self):
+        """Waits for the background start-up to finish. Returns True if the engine is running."""
+        if self._stockfish_thread is not None:
+            self._stockfish_thread.join()
+            self._stockfish_thread = None
+        return self._stockfish_ready
+
     def _select_board_region(self):
         """Lets the user select the board region."""
         logging.info("A window will appear. Draw a TIGHT rectangle on the 8x8 squares only, INSIDE the coordinates.")
         try:
-            screenshot = pyautogui.screenshot()
-            img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+            img = np.ascontiguousarray(self.capture.grab())
             roi = cv2.selectROI("Select Chessboard Region", img, fromCenter=False, showCrosshair=True)
             cv2.destroyAllWindows()
             if roi[2] == 0 or roi[3] == 0:
@@ -97,152 +260,236 @@ class ChessAssistant:
 
     def _identify_piece(self, square_img):
         """Identifies a piece using masked template matching."""
-        best_match_piece = None
-        max_score = self.config['CONFIDENCE_THRESHOLD']
-        h, w, _ = square_img.shape
-        for piece_code, template in self.piece_templates.items():
-            resized_template = cv2.resize(template, (w, h), interpolation=cv2.INTER_AREA)
-            mask = self.template_masks[piece_code]
-            resized_mask = cv2.resize(mask, (w, h), interpolation=cv2.INTER_AREA)
-            res = cv2.matchTemplate(square_img, resized_template, cv2.TM_CCOEFF_NORMED, mask=resized_mask)
-            _, current_max, _, _ = cv2.minMaxLoc(res)
-            if current_max > max_score:
-                max_score = current_max
-                best_match_piece = piece_code
-        return best_match_piece
-
-    def _image_to_fen_pieces(self):
-        """Captures the board and returns the piece placement part of the FEN."""
+        labels, _ = self.classifier.classify(square_img[np.newaxis], self.config['CONFIDENCE_THRESHOLD'])
+        return labels[0]
+
+    def _calibrate(self):
+        """Calibrates the empty/colour fast path from a capture of the starting position."""
+        if not self.board_region: return False
+        board_img = self.capture.grab(self.board_region)
+        if board_img is None: return False
+        calibrated = self.cascade.calibrate(split_squares(board_img), self.is_playing_as_black)
+        self.incremental.reset()
+        return calibrated
+
+    def _grab_board(self):
+        """Grabs the selected board region, or None before one is selected."""
         if not self.board_region: return None
-        screenshot = pyautogui.screenshot(region=self.board_region)
-        board_img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-        square_h, square_w = board_img.shape[0] // 8, board_img.shape[1] // 8
-        fen_rows = []
-        for r in range(8):
-            fen_row = ""
-            empty_count = 0
-            for c in range(8):
-                square = board_img[r*square_h:(r+1)*square_h, c*square_w:(c+1)*square_w]
-                piece = self._identify_piece(square)
-                if piece:
-                    if empty_count > 0: fen_row += str(empty_count)
-                    empty_count = 0
-                    piece_char = piece[1]
-                    fen_row += piece_char.lower() if piece[0] == 'b' else piece_char.upper()
-                else:
-                    empty_count += 1
-            if empty_count > 0: fen_row += str(empty_count)
-            fen_rows.append(fen_row)
-        fen = "/".join(fen_rows)
-        return '/'.join(row[::-1] for row in fen.split('/')[::-1]) if self.is_playing_as_black else fen
+        return self.capture.grab(self.board_region)
+
+    def _image_to_fen_pieces(self, board_img=None, recheck=()):
+        """Returns the piece placement part of the FEN, capturing the board unless board_img is given.
+
+        Squares in `recheck` (placement order) are reclassified even if unchanged.
+        """
+        if board_img is None:
+            with METRICS.timer("capture"):
+                board_img = self._grab_board()
+        if board_img is None: return None
+        threshold = self.config['CONFIDENCE_THRESHOLD']
+        force = [63 - i for i in recheck] if self.is_playing_as_black else recheck
+        with METRICS.timer("recognize"):
+            labels, self.last_scores = self.incremental.classify(split_squares(board_img), threshold, force)
+            fen = labels_to_fen(labels, self.is_playing_as_black)
+        margins = confidence_margins(self.last_scores, threshold)
+        self.last_confidence = margins[::-1] if self.is_playing_as_black else margins
+        METRICS.incr("frames")
+        METRICS.incr("squares_reclassified", len(self.incremental.changed))
+        return fen
     
     def _validate_fen(self, fen_pieces):
         """Checks if a FEN has both kings."""
         return fen_pieces.count('K') == 1 and fen_pieces.count('k') == 1
 
-    def _find_played_move(self, new_fen_pieces):
-        """Finds the legal move that transitions the internal board to the new FEN."""
-        for move in self.internal_board.legal_moves:
-            self.internal_board.push(move)
-            if self.internal_board.fen().split(' ')[0] == new_fen_pieces:
-                self.internal_board.pop()
-                return move
-            self.internal_board.pop()
-        return None
+    @property
+    def internal_board(self):
+        """The board of the game being followed."""
+        return self.session.board
     
+    def _format_analysis(self, info, board):
+        """Turns multipv analysis into (best_move, top_moves_str)."""
+        if not info: return None, "No moves found"
+        top_moves = []
+        for item in info:
+            move = item.get('pv', [None])[0]
+            if move is None: continue
+            if 'score' not in item:
+                # Book and tablebase answers carry a label instead of a score.
+                top_moves.append(f"{move.uci()} ({item.get('label', '?')})")
+                continue
+            score = item['score'].pov(board.turn)
+            eval_str = f"Mate in {score.mate()}" if score.is_mate() else f"{score.score() / 100.0:+.2f}"
+            top_moves.append(f"{move.uci()} (Eval: {eval_str})")
+        if not top_moves: return None, "No moves found"
+        return top_moves[0].split(' ')[0], " | ".join(top_moves)
+
     def _get_best_move(self):
         """Gets the best move for the current internal board state."""
         try:
-            limit = chess.engine.Limit(time=self.config['STOCKFISH_THINK_TIME'])
-            info = self.engine.analyse(self.internal_board, limit, multipv=3)
-            if not info: return None, "No moves found"
-            top_moves = []
-            for item in info:
-                move = item.get('pv', [None])[0]
-                if move is None: continue
-                score = item['score'].pov(self.internal_board.turn)
-                eval_str = f"Mate in {score.mate()}" if score.is_mate() else f"{score.score() / 100.0:+.2f}"
-                top_moves.append(f"{move.uci()} (Eval: {eval_str})")
-            return top_moves[0].split(' ')[0], " | ".join(top_moves)
+            board = self.internal_board.copy()
+            info = analyse(self.engine, board, self.stop_conditions, 3, self._on_progress, self.analysis_cache,
+                           lookup=self.lookup)
+            return self._format_analysis(info, board)
         except Exception as e:
             logging.error(f"Engine analysis failed: {e}")
             return None, "Analysis Error"
 
+    def _start_analysis_worker(self):
+        """Starts the background worker that analyses positions while capture keeps running."""
+        self.analysis_worker = AnalysisWorker(self.engine, self.stop_conditions, self._on_analysis, self._on_progress,
+                                              cache=self.analysis_cache, ponder_stop=self.ponder_stop,
+                                              ponder_replies=self.config.get('PONDER_REPLIES', 0), lookup=self.lookup)
+        self.analysis_worker.start()
+
+    def _on_progress(self, board, info):
+        """Shows the current best lines each time the search completes a depth."""
+        _, top_moves_str = self._format_analysis(info, board)
+        print(f"   depth {info[0].get('depth', '?')}: {top_moves_str}", end="\r", flush=True)
+
+    def _on_analysis(self, board, info):
+        """Prints a finished analysis; called from the worker thread."""
+        best_move, top_moves_str = self._format_analysis(info, board)
+        print("\n" + "="*70)
+        if best_move:
+            print(f"♟️ Best Move: {best_move}")
+            print(f"📊 Top Moves: {top_moves_str}")
+        else:
+            print(f"⚠️ Could not retrieve analysis. Reason: {top_moves_str}")
+        print("="*70)
+
     def run(self):
         """The main loop of the chess assistant."""
         if not self.setup():
+            if self.engine: self.engine.quit()
             input("Initialization failed. Press Enter to exit.")
             return
 
+        if self.config.get('METRICS_ENABLED'):
+            METRICS.start(self.config.get('METRICS_SNAPSHOT_PATH'), self.config.get('METRICS_INTERVAL', 30.0),
+                          self.config.get('METRICS_PORT'))
+
+        if self.config.get('CLOCK_REGION') is not None:
+            clock = ClockReader(self.config.get('CLOCK_DIGITS_PATH', 'clock_digits/'), self.config['CLOCK_REGION'])
+            self.clock = clock if clock.load_digits() else None
+
         self.is_playing_as_black = 'y' in input("Are you playing as Black (board is flipped)? [y/N]: ").lower()
 
         print("\n✅ Assistant ready. Please set up the board to the starting position of your game.")
         input("--> Press ENTER when the starting position is on the screen...")
+        if not self._calibrate():
+            logging.warning("Calibration failed. Falling back to full template matching.")
         
         initial_fen_pieces = self._image_to_fen_pieces()
-        if not self._validate_fen(initial_fen_pieces):
+        PROFILE.mark("first recognized frame")
+        if self.config.get('PROFILE_STARTUP'):
+            PROFILE.report()
+        if not self._validate_fen(initial_fen_pieces) or not self.session.reset(initial_fen_pieces, chess.WHITE):
             print(f"⚠️ Could not recognize a valid initial board. Detected: {initial_fen_pieces}")
             print("This is a CALIBRATION issue. Try adjusting CONFIDENCE_THRESHOLD at the top of the script and restart.")
             return
             
-        self.internal_board = chess.Board(initial_fen_pieces)
+        self.stabilizer.reset(initial_fen_pieces)
         print(f"✅ Initial position recognized: {initial_fen_pieces}")
 
+        self._start_analysis_worker()
+
         # --- NEW LOGIC TO SUGGEST THE FIRST MOVE ---
         if not self.is_playing_as_black and self.internal_board.turn == chess.WHITE:
-            print("\n" + "="*70)
             print("It's your turn to move (White). Analyzing opening move...")
-            best_move, top_moves_str = self._get_best_move()
-            if best_move:
-                print(f"♟️ Best Opening Move: {best_move}")
-                print(f"📊 Top Moves: {top_moves_str}")
-            print("="*70)
+            self.analysis_worker.submit(self.internal_board)
         # -------------------------------------------
 
+        # Recognition only runs once the board has changed and stopped moving.
+        scheduler = CaptureScheduler(self._grab_board, self.config.get('CAPTURE_POLL_INTERVAL', 0.05),
+                                     self.config.get('CAPTURE_DEBOUNCE', 0.15),
+                                     self.config.get('CAPTURE_IDLE_AFTER', 30.0), self.config['CAPTURE_INTERVAL'])
+
         print("\nWatching for moves...")
         
         try:
             while True:
-                time.sleep(self.config['CAPTURE_INTERVAL'])
-                current_fen_pieces = self._image_to_fen_pieces()
+                # Move inference and the engine only ever see positions whose changed squares have settled.
+                reading = self._image_to_fen_pieces(scheduler.wait(), self.stabilizer.pending)
+                current_fen_pieces = self.stabilizer.update(reading, self.last_confidence)
+                if self.stabilizer.pending:
+                    scheduler.recheck(self.config.get('STABILIZER_RECHECK', 0.1))
                 
-                if current_fen_pieces and current_fen_pieces != self.internal_board.fen().split(' ')[0]:
+                if current_fen_pieces and current_fen_pieces != self.internal_board.board_fen():
                     print("\n" + "="*70)
                     logging.info("Change detected. Analyzing...")
+                    METRICS.incr("changed_frames")
                     if not self._validate_fen(current_fen_pieces):
+                        METRICS.incr("invalid_fens")
                         logging.warning(f"Bad recognition detected: {current_fen_pieces}. Waiting for clearer view.")
+                        scheduler.recheck(self.config['CAPTURE_INTERVAL'])
                         continue
 
-                    move_played = self._find_played_move(current_fen_pieces)
-                    if move_played:
-                        self.internal_board.push(move_played)
-                        print(f"✅ Move Detected: {move_played.uci()}")
+                    with METRICS.timer("infer_move"):
+                        moves_played = self.session.follow(current_fen_pieces, self.config.get('MAX_GAP_PLIES', 3))
+                    if moves_played:
+                        print(f"✅ Move Detected: {' '.join(m.uci() for m in moves_played)}")
                         is_my_turn = (not self.is_playing_as_black and self.internal_board.turn == chess.WHITE) or \
                                      (self.is_playing_as_black and self.internal_board.turn == chess.BLACK)
                         if is_my_turn:
                             print("Analyzing for your best move...")
-                            best_move, top_moves_str = self._get_best_move()
-                            if best_move:
-                                print(f"♟️ Best Move: {best_move}")
-                                print(f"📊 Top Moves: {top_moves_str}")
-                            else:
-                                print(f"⚠️ Could not retrieve analysis. Reason: {top_moves_str}")
+                            # Returns at once; a newer position stops this search.
+                            self.analysis_worker.submit(self.internal_board,
+                                                        self.clock.read(self.capture) if self.clock else None)
                         else:
+                            # Use the opponent's thinking time to prepare answers to their likely replies.
+                            self.analysis_worker.ponder(self.internal_board)
                             print("Opponent is thinking...")
                     else:
                         print("⚠️ Could not determine last move. Re-synchronizing.")
-                        self.internal_board.set_fen(current_fen_pieces)
+                        METRICS.incr("resyncs")
+                        self.analysis_worker.cancel()
+                        # The history is lost; the side to move is guessed until the next move settles it.
+                        if not self.session.reset(current_fen_pieces):
+                            METRICS.incr("invalid_fens")
+                            logging.warning(f"Not a legal position: {current_fen_pieces}. Waiting for clearer view.")
+                            scheduler.recheck(self.config['CAPTURE_INTERVAL'])
                     print("="*70)
         except KeyboardInterrupt:
             print("\nProgram stopped by user.")
         finally:
+            METRICS.stop()
+            if self.analysis_worker: self.analysis_worker.close()
+            if self.analysis_cache: self.analysis_cache.close()
+            if self.lookup: self.lookup.close()
             if self.engine: self.engine.quit()
+            self.capture.close()
+            self.pool.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="All-in-one real-time chess assistant.")
+    parser.add_argument("--profile-startup", action="store_true", help="log how long imports and start-up steps take")
+    args = parser.parse_args()
     config = {
         "STOCKFISH_PATH": STOCKFISH_PATH, "PIECE_THEME": PIECE_THEME,
         "CONFIDENCE_THRESHOLD": CONFIDENCE_THRESHOLD, "CAPTURE_INTERVAL": CAPTURE_INTERVAL,
-        "STOCKFISH_THINK_TIME": STOCKFISH_THINK_TIME
+        "CAPTURE_POLL_INTERVAL": CAPTURE_POLL_INTERVAL, "CAPTURE_DEBOUNCE": CAPTURE_DEBOUNCE,
+        "CAPTURE_IDLE_AFTER": CAPTURE_IDLE_AFTER,
+        "STOCKFISH_THINK_TIME": STOCKFISH_THINK_TIME, "TEMPLATE_CACHE_SIZE": TEMPLATE_CACHE_SIZE,
+        "STOCKFISH_THREADS": STOCKFISH_THREADS, "STOCKFISH_HASH_MB": STOCKFISH_HASH_MB,
+        "TIME_FORCED": TIME_FORCED, "TIME_FEW_MOVES": TIME_FEW_MOVES, "TIME_EXTEND": TIME_EXTEND,
+        "TIME_CLEAR_GAP": TIME_CLEAR_GAP, "TIME_UNSTABLE_MARGIN": TIME_UNSTABLE_MARGIN,
+        "CLOCK_REGION": CLOCK_REGION, "CLOCK_DIGITS_PATH": CLOCK_DIGITS_PATH, "CLOCK_FRACTION": CLOCK_FRACTION,
+        "MAX_GAP_PLIES": MAX_GAP_PLIES,
+        "STABILIZER_FRAMES": STABILIZER_FRAMES, "STABILIZER_MARGIN": STABILIZER_MARGIN,
+        "STABILIZER_RECHECK": STABILIZER_RECHECK,
+        "SQUARE_CHANGE_THRESHOLD": SQUARE_CHANGE_THRESHOLD, "FULL_REFRESH_FRAMES": FULL_REFRESH_FRAMES,
+        "CAPTURE_BACKEND": CAPTURE_BACKEND, "CAPTURE_REPLAY_PATH": CAPTURE_REPLAY_PATH,
+        "RECOGNITION_WORKERS": RECOGNITION_WORKERS, "RECOGNITION_BACKEND": RECOGNITION_BACKEND,
+        "RECOGNITION_MIN_WORK": RECOGNITION_MIN_WORK,
+        "ANALYSIS_MAX_DEPTH": ANALYSIS_MAX_DEPTH, "ANALYSIS_MIN_DEPTH": ANALYSIS_MIN_DEPTH,
+        "ANALYSIS_STABLE_ITERATIONS": ANALYSIS_STABLE_ITERATIONS, "ANALYSIS_STABLE_MARGIN": ANALYSIS_STABLE_MARGIN,
+        "ANALYSIS_CACHE_PATH": ANALYSIS_CACHE_PATH, "ANALYSIS_CACHE_SIZE": ANALYSIS_CACHE_SIZE,
+        "ANALYSIS_CACHE_DEPTH": ANALYSIS_CACHE_DEPTH,
+        "METRICS_ENABLED": METRICS_ENABLED, "METRICS_SNAPSHOT_PATH": METRICS_SNAPSHOT_PATH,
+        "METRICS_INTERVAL": METRICS_INTERVAL, "METRICS_PORT": METRICS_PORT,
+        "PONDER_REPLIES": PONDER_REPLIES, "PONDER_PREDICT_TIME": PONDER_PREDICT_TIME,
+        "OPENING_BOOK_PATH": OPENING_BOOK_PATH, "SYZYGY_PATH": SYZYGY_PATH,
+        "PROFILE_STARTUP": args.profile_startup
     }
     assistant = ChessAssistant(config)
     assistant.run()
\ No newline at end of file
@@ -0,0 +1,159 @@
+# analysis.py
+
+import time
+import logging
+from metrics import METRICS
+
+MATE_SCORE = 100000
+
+class StopConditions:
+    """When a streaming search has seen enough.
+
+    A search ends at max_depth, after max_time seconds, or once the best move
+    and its eval have held (within stable_margin centipawns) for
+    stable_iterations consecutive depths past min_depth. Any of them may be None.
+
+    Past min_depth it also ends once the best move has held for two depths
+    and leads the second line by clear_gap centipawns. After soft_time
+    seconds it ends at the next depth, unless that depth changed the best
+    move or moved the eval by more than unstable_margin centipawns; max_time
+    stays the hard limit.
+    """
+
+    def __init__(self, max_time=None, max_depth=None, stable_iterations=None, stable_margin=15, min_depth=8,
+                 soft_time=None, clear_gap=None, unstable_margin=None):
+        self.max_time = max_time
+        self.max_depth = max_depth
+        self.stable_iterations = stable_iterations
+        self.stable_margin = stable_margin
+        self.min_depth = min_depth
+        self.soft_time = soft_time
+        self.clear_gap = clear_gap
+        self.unstable_margin = unstable_margin
+
+    def for_board(self, board, clock=None):
+        """The conditions for one position. Fixed here; see time_manager.TimeManager."""
+        return self
+
+    def limit(self):
+        """The hard part of the conditions, enforced by the engine itself."""
+        # chess.engine loads asyncio; importing it here keeps it off the start-up path.
+        import chess.engine
+        return chess.engine.Limit(time=self.max_time, depth=self.max_depth)
+
+    def deeper_than(self, depth):
+        """Same conditions, but never settling at or below `depth`."""
+        return StopConditions(self.max_time, self.max_depth, self.stable_iterations,
+                              self.stable_margin, max(self.min_depth, depth + 1),
+                              self.soft_time, self.clear_gap, self.unstable_margin)
+
+def score_gap(lines, turn):
+    """Centipawns by which the first multipv line leads the second, or None unless both are scored at one depth."""
+    if len(lines) < 2 or any('score' not in line for line in lines[:2]) or lines[0].get('depth') != lines[1].get('depth'):
+        return None
+    first, second = (line['score'].pov(turn).score(mate_score=MATE_SCORE) for line in lines[:2])
+    return first - second
+
+def stream_analysis(analysis, board, stop, on_update=None):
+    """Consumes UCI info updates from a running analysis until a stop condition is met.
+
+    `analysis` is a started SimpleAnalysisResult. on_update(board, info) is
+    called with the current multipv lines each time the main line reaches a
+    new depth. Returns the multipv lines at the point the search ended.
+    """
+    start = time.monotonic()
+    last_depth = 0
+    last_move = None
+    last_cp = None
+    stable = 0
+    extended = False
+
+    for info in analysis:
+        if 'pv' not in info or 'score' not in info:
+            continue
+        if info.get('multipv', 1) == 2:
+            # The runner-up has just reached the main line's depth, so the two can be compared.
+            if stop.clear_gap is not None and last_depth >= stop.min_depth and stable >= 1:
+                gap = score_gap(analysis.multipv, board.turn)
+                if gap is not None and gap >= stop.clear_gap:
+                    METRICS.incr("clear_best_stops")
+                    break
+            continue
+        if info.get('multipv', 1) != 1:
+            continue
+        depth = info.get('depth', 0)
+        if depth <= last_depth:
+            continue
+        last_depth = depth
+
+        if on_update:
+            on_update(board, analysis.multipv)
+
+        move = info['pv'][0]
+        cp = info['score'].pov(board.turn).score(mate_score=MATE_SCORE)
+        unstable = last_move is not None and (
+            move != last_move or (stop.unstable_margin is not None and abs(cp - last_cp) > stop.unstable_margin))
+        if move == last_move and abs(cp - last_cp) <= stop.stable_margin:
+            stable += 1
+        else:
+            stable = 0
+        last_move, last_cp = move, cp
+
+        elapsed = time.monotonic() - start
+        if stop.max_depth is not None and depth >= stop.max_depth:
+            break
+        if stop.max_time is not None and elapsed >= stop.max_time:
+            break
+        if stop.stable_iterations is not None and depth >= stop.min_depth and stable >= stop.stable_iterations:
+            break
+        if stop.soft_time is not None and elapsed >= stop.soft_time:
+            if not unstable:
+                break
+            if not extended:
+                METRICS.incr("extended_searches")
+                extended = True
+
+    analysis.stop()
+    analysis.wait()
+    return analysis.multipv
+
+
+def analyse(engine, board, stop, multipv=3, on_update=None, cache=None, on_start=None, lookup=None, clock=None):
+    """Analyses a board, answering from the cache when it holds a deep enough result.
+
+    A shallower cached result is shown through on_update straight away and
+    the search then has to go deeper than it before settling. on_start, if
+    given, receives the running analysis so another thread can stop it.
+    A `lookup` (book and tablebases) is asked before the cache and the engine.
+    `stop` may also be a time_manager.TimeManager, which picks the conditions
+    for this board and the seconds left on the `clock`.
+    """
+    stop = stop.for_board(board, clock)
+    if lookup is not None:
+        info = lookup.probe(board, multipv)
+        if info:
+            logging.info(f"Answered from the {info[0]['source']}.")
+            return info
+
+    if cache is not None:
+        cached = cache.get(board)
+        if cached is not None:
+            depth, info = cached
+            if depth >= cache.sufficient_depth:
+                METRICS.incr("cache_hits")
+                return info
+            METRICS.incr("cache_partial_hits")
+            if on_update:
+                on_update(board, info)
+            stop = stop.deeper_than(depth)
+        else:
+            METRICS.incr("cache_misses")
+
+    with METRICS.timer("analyse"), engine.analysis(board, stop.limit(), multipv=multipv) as analysis:
+        if on_start:
+            on_start(analysis)
+        info = stream_analysis(analysis, board, stop, on_update)
+
+    if cache is not None:
+        cache.put(board, info)
+    return info
\ No newline at end of file
@@ -0,0 +1,128 @@
+# analysis_cache.py
+
+import json
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+import chess
+import chess.polyglot
+
+class AnalysisCache:
+    """Remembers finished analyses by Zobrist hash, in memory and in SQLite.
+
+    The in-memory tier is a bounded LRU; the SQLite tier survives restarts.
+    Entries store the search depth and the multipv lines, and are only ever
+    replaced by a deeper search of the same position.
+    """
+
+    def __init__(self, path=None, max_entries=10000, sufficient_depth=20):
+        self.max_entries = max_entries
+        self.sufficient_depth = sufficient_depth
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS positions "
+                    "(key INTEGER PRIMARY KEY, epd TEXT NOT NULL, depth INTEGER NOT NULL, lines TEXT NOT NULL)"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logging.error(f"Could not open analysis cache '{path}': {e}. Using memory only.")
+                self._db = None
+
+    @staticmethod
+    def _key(board):
+        # SQLite integers are signed 64-bit.
+        key = chess.polyglot.zobrist_hash(board)
+        return key - (1 << 64) if key >= (1 << 63) else key
+
+    @staticmethod
+    def _encode(info):
+        lines = []
+        for item in info:
+            if 'pv' not in item or 'score' not in item:
+                continue
+            score = item['score'].white()
+            lines.append({
+                "pv": [move.uci() for move in item['pv']],
+                "mate": score.mate() if score.is_mate() else None,
+                "cp": None if score.is_mate() else score.score(),
+                "depth": item.get('depth', 0),
+            })
+        return lines
+
+    @staticmethod
+    def _decode(lines):
+        import chess.engine
+        info = []
+        for i, line in enumerate(lines, 1):
+            score = chess.engine.Mate(line["mate"]) if line["mate"] is not None else chess.engine.Cp(line["cp"])
+            info.append({
+                "multipv": i,
+                "depth": line["depth"],
+                "pv": [chess.Move.from_uci(uci) for uci in line["pv"]],
+                "score": chess.engine.PovScore(score, chess.WHITE),
+            })
+        return info
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, board):
+        """Returns (depth, info) for the position, or None if it was never analysed."""
+        key, epd = self._key(board), board.epd()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute("SELECT epd, depth, lines FROM positions WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = (row[0], row[1], json.loads(row[2]))
+                    self._remember(key, entry)
+            elif entry is not None:
+                self._memory.move_to_end(key)
+
+            # A hash collision is vanishingly rare, but a wrong suggestion is worse than a miss.
+            if entry is None or entry[0] != epd:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1], self._decode(entry[2])
+
+    def put(self, board, info):
+        """Stores an analysis unless a deeper one of the same position is already cached."""
+        lines = self._encode(info)
+        if not lines:
+            return
+        depth = lines[0]["depth"]
+        key, epd = self._key(board), board.epd()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] == epd and entry[1] >= depth:
+                return
+            self._remember(key, (epd, depth, lines))
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT INTO positions (key, epd, depth, lines) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET epd = excluded.epd, depth = excluded.depth, "
+                        "lines = excluded.lines WHERE excluded.depth > positions.depth OR positions.epd != excluded.epd",
+                        (key, epd, depth, json.dumps(lines)),
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logging.error(f"Could not write to analysis cache: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
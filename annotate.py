@@ -0,0 +1,132 @@
+# annotate.py - batch analysis of PGN games or FEN position lists.
+#
+#   python annotate.py games.pgn -o annotated.pgn --processes 8 --think-time 0.5
+#   python annotate.py positions.fen -o evals.tsv
+#
+# Positions are spread over a pool of engine processes (ENGINE_POOL_SIZE,
+# one per core by default). PGN games get an [%eval] comment after every
+# move and the engine's choice as a variation where it differs from the
+# move played. A FEN file (one position per line) gives one tab-separated
+# line per position: FEN, best move, eval from White's side, depth, PV.
+
+import argparse
+import logging
+import sys
+from collections import deque
+import chess
+import chess.pgn
+
+from config import (STOCKFISH_PATH, ENGINE_POOL_SIZE, ENGINE_THREADS, ENGINE_HASH_MB,
+                    ANALYSIS_MIN_DEPTH, ANALYSIS_STABLE_ITERATIONS, ANALYSIS_STABLE_MARGIN)
+from analysis import StopConditions
+from engine_pool import EnginePool
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def format_eval(score):
+    """A PovScore as PGN eval text from White's side, e.g. 0.31 or #-3."""
+    score = score.white()
+    if score.is_mate():
+        return f"#{score.mate()}"
+    return f"{score.score() / 100.0:.2f}"
+
+def read_fens(path):
+    """Yields a board for every non-empty, non-comment line of a FEN file."""
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield chess.Board(line)
+
+def read_games(path):
+    """Yields the games of a PGN file one at a time."""
+    with open(path) as f:
+        while True:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                return
+            yield game
+
+def annotate_fens(pool, path, stop, out):
+    """Writes one tab-separated result line per position of a FEN file."""
+    for board, info in pool.analyse_all(read_fens(path), stop):
+        if not info or 'pv' not in info[0]:
+            out.write(f"{board.fen()}\t-\t-\t-\t-\n")
+            continue
+        line = info[0]
+        out.write(f"{board.fen()}\t{line['pv'][0].uci()}\t{format_eval(line['score'])}\t"
+                  f"{line.get('depth', 0)}\t{board.variation_san(line['pv'])}\n")
+
+def annotate_games(pool, path, stop, out):
+    """Annotates every game of a PGN file; all positions of all games share the pool.
+
+    Games are read and their positions built only as fast as the pool takes
+    them, and each game is written as soon as its last position is done.
+    """
+    games = deque()
+
+    def positions():
+        for game in read_games(path):
+            nodes = [game] + list(game.mainline())
+            games.append(nodes)
+            # The root and every mainline move each have a position to analyse.
+            board = game.board()
+            yield board
+            for node in nodes[1:]:
+                board.push(node.move)
+                yield board
+
+    nodes, infos = None, []
+    done = 0
+    for _, info in pool.analyse_all(positions(), stop):
+        if not infos:
+            # The game was queued before its first position was handed to the pool.
+            nodes = games.popleft()
+        infos.append(info)
+        if len(infos) < len(nodes):
+            continue
+        for i in range(1, len(nodes)):
+            node, after, before = nodes[i], infos[i], infos[i - 1]
+            if after and 'score' in after[0]:
+                node.comment = f"[%eval {format_eval(after[0]['score'])}] {node.comment}".strip()
+            if before and before[0].get('pv') and before[0]['pv'][0] != node.move:
+                node.parent.add_variation(before[0]['pv'][0])
+        game = nodes[0]
+        print(game, file=out, end="\n\n")
+        done += 1
+        logging.info(f"Annotated {game.headers.get('White', '?')} - {game.headers.get('Black', '?')} "
+                     f"(game {done}, {len(nodes)} positions).")
+        infos = []
+
+def main():
+    parser = argparse.ArgumentParser(description="Annotate PGN games or FEN positions with engine evaluations.")
+    parser.add_argument("input", help="a .pgn file, or a text file with one FEN per line")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--engine", nargs="+", default=[STOCKFISH_PATH], help="UCI engine command")
+    parser.add_argument("--processes", type=int, default=ENGINE_POOL_SIZE, help="engine processes (default: one per core)")
+    parser.add_argument("--threads", type=int, default=ENGINE_THREADS, help="Threads option of each process")
+    parser.add_argument("--hash", type=int, default=ENGINE_HASH_MB, help="Hash option of each process, in MB")
+    parser.add_argument("--think-time", type=float, default=0.5, help="time cap per position in seconds")
+    parser.add_argument("--depth", type=int, default=18, help="depth cap per position")
+    args = parser.parse_args()
+
+    stop = StopConditions(max_time=args.think_time, max_depth=args.depth,
+                          stable_iterations=ANALYSIS_STABLE_ITERATIONS, stable_margin=ANALYSIS_STABLE_MARGIN,
+                          min_depth=ANALYSIS_MIN_DEPTH)
+    pool = EnginePool(args.engine, args.processes, args.threads, args.hash)
+    if not pool.start():
+        sys.exit(1)
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        if args.input.lower().endswith(".pgn"):
+            annotate_games(pool, args.input, stop, out)
+        else:
+            annotate_fens(pool, args.input, stop, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        pool.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 # assistant.py
 
-import time
+import argparse
 import logging
-from config import CAPTURE_INTERVAL
-from recognition import BoardRecognizer
-from engine import Engine
+import chess
+from config import (CAPTURE_INTERVAL, CAPTURE_POLL_INTERVAL, CAPTURE_DEBOUNCE, CAPTURE_IDLE_AFTER,
+                    METRICS_ENABLED, METRICS_SNAPSHOT_PATH, METRICS_INTERVAL, METRICS_PORT, CAPTURE_BACKEND,
+                    CAPTURE_REPLAY_PATH, PIPELINE_WORKERS, PIPELINE_SLOTS, STABILIZER_FRAMES, STABILIZER_MARGIN,
+                    STABILIZER_RECHECK, CLOCK_REGION, CLOCK_DIGITS_PATH)
+from metrics import METRICS, PROFILE
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s -[%(levelname)s]- %(message)s')
 
@@ -14,52 +17,136 @@ def validate_fen(fen_pieces):
 
 def main():
     """Main function for the dynamic chess assistant."""
-    recognizer = BoardRecognizer()
+    parser = argparse.ArgumentParser(description="Real-time chess assistant.")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="capture and recognize in separate processes around a shared-memory frame ring")
+    parser.add_argument("--clock", action="store_true",
+                        help="select your clock on screen too, so think time is cut when it runs low")
+    parser.add_argument("--profile-startup", action="store_true", help="log how long imports and start-up steps take")
+    args = parser.parse_args()
+
+    # The engine starts in the background while templates load and the region is selected.
+    with PROFILE.step("import engine"):
+        from engine import Engine
     stockfish_engine = Engine()
+    stockfish_engine.startup_in_background()
+    with PROFILE.step("import recognition"):
+        from scheduler import CaptureScheduler
+        from recognition import BoardRecognizer
+        from stabilizer import PositionStabilizer
+        from game_session import GameSession
+    with PROFILE.step("open capture"):
+        recognizer = BoardRecognizer()
 
     # Initialization
-    if not recognizer.load_templates(): return
-    if not stockfish_engine.startup(): return
-    if not recognizer.select_board_region(): return
+    with PROFILE.step("load templates"):
+        loaded = recognizer.load_templates()
+    if not loaded or not recognizer.select_board_region():
+        stockfish_engine.shutdown()
+        return
+    if METRICS_ENABLED:
+        METRICS.start(METRICS_SNAPSHOT_PATH, METRICS_INTERVAL, METRICS_PORT)
     
+    clock = None
+    if args.clock or CLOCK_REGION is not None:
+        from clock import ClockReader
+        clock = ClockReader(CLOCK_DIGITS_PATH, CLOCK_REGION)
+        if not clock.load_digits() or (clock.region is None and not clock.select_region(recognizer.capture)):
+            print("⚠️ Clock reading is off; every position gets the normal think time.")
+            clock = None
+
     is_flipped = 'y' in input("Are you playing as Black (board is flipped)? [y/N]: ").lower()
+    if 'y' in input("Is the starting position on screen now (to calibrate recognition)? [y/N]: ").lower():
+        if not recognizer.calibrate(is_flipped):
+            print("⚠️ Calibration failed. Falling back to full template matching.")
+    if not stockfish_engine.wait_ready():
+        recognizer.close()
+        return
+
+    def print_progress(board, info):
+        _, top_moves_str = stockfish_engine.format_analysis(info, board)
+        print(f"   depth {info[0].get('depth', '?')}: {top_moves_str}", end="\r", flush=True)
+
+    def print_analysis(board, info):
+        best_move, top_moves_str = stockfish_engine.format_analysis(info, board)
+        print()
+        print(f"♟️ Best Move: {best_move}")
+        print(f"📊 Top Moves: {top_moves_str}")
+        print("="*70)
+
+    # Analysis runs on a worker thread so capture never waits on the engine.
+    analysis_worker = stockfish_engine.start_analysis_worker(print_analysis, print_progress)
     
+    # Recognition only runs once the board has changed and stopped moving, and a
+    # position is only analysed once every changed square has settled.
+    stabilizer = PositionStabilizer(STABILIZER_FRAMES, STABILIZER_MARGIN)
+    # The game is followed move by move, so the engine sees its real history.
+    session = GameSession()
+    pipeline = None
+    if args.pipeline:
+        from frame_pipeline import FramePipeline
+        pipeline = FramePipeline(recognizer.board_region, is_flipped, PIPELINE_WORKERS, PIPELINE_SLOTS,
+                                 CAPTURE_BACKEND, CAPTURE_REPLAY_PATH,
+                                 (CAPTURE_POLL_INTERVAL, CAPTURE_DEBOUNCE, CAPTURE_IDLE_AFTER, CAPTURE_INTERVAL))
+        pipeline.start()
+        read_position = lambda: pipeline.next_result()[1:]
+        # Unsettled squares go with the recheck, so the recognition processes reclassify them too.
+        recheck = lambda delay: pipeline.recheck(delay, stabilizer.pending)
+    else:
+        scheduler = CaptureScheduler(recognizer.grab_board, CAPTURE_POLL_INTERVAL, CAPTURE_DEBOUNCE,
+                                     CAPTURE_IDLE_AFTER, CAPTURE_INTERVAL)
+        # Unsettled squares are reclassified on every re-read, so their readings are independent.
+        read_position = lambda: (recognizer.image_to_fen_pieces(is_flipped, scheduler.wait(), stabilizer.pending),
+                                 recognizer.last_confidence)
+        recheck = scheduler.recheck
+
     print("\n✅ Assistant started. Watching for board changes...")
     last_fen = None
 
     try:
         while True:
-            current_fen = recognizer.image_to_fen_pieces(is_flipped)
+            current_fen = stabilizer.update(*read_position())
+            if stabilizer.pending:
+                recheck(STABILIZER_RECHECK)
+            if last_fen is None and current_fen:
+                PROFILE.mark("first recognized frame")
+                if args.profile_startup:
+                    PROFILE.report()
             
             if current_fen and current_fen != last_fen:
                 print("\n" + "="*70)
                 print(f"✅ New Position Detected: {current_fen}")
                 
+                METRICS.incr("changed_frames")
                 if not validate_fen(current_fen):
+                    METRICS.incr("invalid_fens")
                     logging.warning(f"Invalid board state recognized. Missing King(s).")
                     print("⚠️ Invalid board state recognized. Please adjust CONFIDENCE_THRESHOLD in config.py")
                     last_fen = current_fen
                     continue
 
-                # Since we are stateless, we must ask for the turn
-                turn_input = input("Whose turn is it to move? [white/black]: ").lower()
-                turn_char = 'b' if 'b' in turn_input else 'w'
-                
-                print("Analyzing...")
-                best_move, top_moves_str = stockfish_engine.get_best_move(current_fen, turn_char)
-                
-                print(f"♟️ Best Move: {best_move}")
-                print(f"📊 Top Moves: {top_moves_str}")
-                print("="*70)
-
                 last_fen = current_fen
-            
-            time.sleep(CAPTURE_INTERVAL)
+                if session.follow(current_fen) is None:
+                    # Only a position that no legal moves lead to needs the turn from the user.
+                    if session.board is not None:
+                        METRICS.incr("resyncs")
+                    turn_input = input("Whose turn is it to move? [white/black]: ").lower()
+                    if not session.reset(current_fen, chess.BLACK if 'b' in turn_input else chess.WHITE):
+                        logging.warning("Recognized position is not a legal board.")
+                        continue
+
+                print("Analyzing...")
+                analysis_worker.submit(session.board.copy(), clock.read(recognizer.capture) if clock else None)
             
     except KeyboardInterrupt:
         print("\nProgram stopped by user.")
     finally:
+        METRICS.stop()
+        if pipeline is not None:
+            pipeline.close()
+        analysis_worker.close()
         stockfish_engine.shutdown()
+        recognizer.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,196 @@
+# batch_classifier.py
+
+import numpy as np
+import logging
+from collections import OrderedDict
+
+def split_squares(board_img):
+    """Stacks the 64 squares of a board image into one (64, h, w, 3) array, a8 first."""
+    square_h, square_w = board_img.shape[0] // 8, board_img.shape[1] // 8
+    grid = board_img[:square_h * 8, :square_w * 8]
+    grid = grid.reshape(8, square_h, 8, square_w, -1).swapaxes(1, 2)
+    return grid.reshape(64, square_h, square_w, -1)
+
+def labels_to_fen(labels, is_flipped=False):
+    """Builds the piece placement part of the FEN from 64 piece codes (None for empty)."""
+    if is_flipped:
+        labels = labels[::-1]
+    fen_rows = []
+    for r in range(8):
+        fen_row = ""
+        empty_count = 0
+        for piece in labels[r*8:(r+1)*8]:
+            if piece:
+                if empty_count > 0: fen_row += str(empty_count)
+                empty_count = 0
+                piece_char = piece[1]
+                fen_row += piece_char.lower() if piece[0] == 'b' else piece_char.upper()
+            else:
+                empty_count += 1
+        if empty_count > 0: fen_row += str(empty_count)
+        fen_rows.append(fen_row)
+    return "/".join(fen_rows)
+
+def confidence_margins(scores, threshold):
+    """How far each square's label is from changing, given its (N, templates) scores.
+
+    For an empty square this is how far its best score is below the
+    threshold. For a piece it is the smaller of how far its score is above
+    the threshold and how far it leads the runner-up.
+    """
+    ordered = np.sort(scores, axis=1)
+    best, second = ordered[:, -1], ordered[:, -2]
+    return np.where(best > threshold, np.minimum(best - threshold, best - second), threshold - best)
+
+class BatchClassifier:
+    """Scores a stack of squares against every template with a few matrix products.
+
+    The score is cv2.matchTemplate's TM_CCOEFF_NORMED with the template's
+    8-bit mask, which OpenCV treats as binary: both the square and the
+    template are centred on their mean per channel over the mask's non-zero
+    pixels, and their dot product there is divided by both norms.
+    Given a ClassifierPool, large batches are scored on several cores.
+    """
+
+    def __init__(self, store, pool=None):
+        self.store = store
+        self.pool = pool
+        self._banks = OrderedDict()
+
+    def _bank(self, w, h):
+        """Returns the flattened, pre-centred template bank for a square size."""
+        key = (w, h)
+        bank = self._banks.get(key)
+        if bank is not None:
+            self._banks.move_to_end(key)
+            return bank
+
+        # A compiled theme pack already holds the bank for its sizes.
+        bank = self.store.pack.bank(w, h) if self.store.pack is not None else None
+        if bank is None:
+            bank = self._build_bank(w, h)
+        self._banks[key] = bank
+        if len(self._banks) > self.store.max_sizes:
+            self._banks.popitem(last=False)
+        return bank
+
+    def _build_bank(self, w, h):
+        scaled = self.store.get(w, h)
+        codes = sorted(scaled)
+        weights = np.stack([scaled[c][1].reshape(-1) > 0 for c in codes]).astype(np.float32)
+        templates = np.stack([scaled[c][0].reshape(h * w, -1) for c in codes]).astype(np.float32)
+        weight_sums = np.maximum(weights.sum(axis=1), 1e-6)
+        means = np.einsum('kp,kpc->kc', weights, templates) / weight_sums[:, None]
+        centred = (templates - means[:, None, :]) * weights[:, :, None]
+        template_var = np.einsum('kpc,kpc->k', centred, templates - means[:, None, :])
+
+        # (channels * pixels, templates), laid out to match a flattened square.
+        projection = centred.transpose(1, 2, 0).reshape(-1, len(codes))
+        logging.debug(f"Template bank built for square size {(w, h)}.")
+        return (codes, weights.T.copy(), weight_sums, projection, template_var)
+
+    def codes(self, w, h):
+        """The piece codes in score-column order for a square size."""
+        return self._bank(w, h)[0]
+
+    def score(self, squares, columns=None):
+        """Returns (piece_codes, scores) where scores is an (N, 12) correlation matrix.
+
+        `columns` restricts scoring to those template indices; the codes and
+        score columns returned then cover only them.
+        """
+        bank = self._bank(squares.shape[2], squares.shape[1])
+        if self.pool is not None and self.pool.worth(squares):
+            return self.pool.score(self, squares, bank, columns)
+        return self._score(squares, bank, columns)
+
+    def _score(self, squares, bank, columns=None):
+        n, h, w, channels = squares.shape
+        codes, weights, weight_sums, projection, template_var = bank
+        if columns is not None:
+            codes = [codes[i] for i in columns]
+            weights, weight_sums = weights[:, columns], weight_sums[columns]
+            projection, template_var = projection[:, columns], template_var[columns]
+
+        flat = squares.reshape(n, h * w, channels).astype(np.float32)
+        numerator = flat.reshape(n, -1) @ projection
+
+        # Weighted first and second moments of every square under every mask.
+        by_channel = flat.transpose(0, 2, 1).reshape(n * channels, h * w)
+        first = (by_channel @ weights).reshape(n, channels, -1)
+        second = ((by_channel * by_channel) @ weights).reshape(n, channels, -1)
+        square_var = (second - first * first / weight_sums).sum(axis=1)
+
+        denominator = np.sqrt(np.maximum(square_var * template_var, 0.0))
+        scores = np.where(denominator > 1e-6, numerator / np.maximum(denominator, 1e-6), 0.0)
+        return codes, scores
+
+    def classify(self, squares, threshold, indices=None):
+        """Returns (labels, scores); a label is None where no template beats the threshold.
+
+        `indices` gives each square's board position (0 = top-left); it is
+        unused here but lets stages that depend on the square colour be
+        swapped in.
+        """
+        codes, scores = self.score(squares)
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(best)), best]
+        labels = [codes[i] if s > threshold else None for i, s in zip(best, best_scores)]
+        return labels, scores
+
+class IncrementalClassifier:
+    """Reclassifies only the squares whose pixels changed since they were last classified."""
+
+    def __init__(self, classifier, change_threshold=8.0, full_refresh_frames=20, sample_step=4):
+        self.classifier = classifier
+        self.change_threshold = change_threshold
+        self.full_refresh_frames = full_refresh_frames
+        self.sample_step = sample_step
+        self.reset()
+
+    def reset(self):
+        """Forgets the previous frame so the next call classifies every square."""
+        self.fingerprints = None
+        self.labels = None
+        self.scores = None
+        self.changed = []
+        self.frames_since_refresh = 0
+
+    def _fingerprint(self, squares):
+        """A strided subsample of every square, cheap enough to diff each frame."""
+        step = self.sample_step
+        return squares[:, ::step, ::step].astype(np.int16)
+
+    def classify(self, squares, threshold, force=()):
+        """Same contract as BatchClassifier.classify, reusing labels of unchanged squares.
+
+        Squares listed in `force` are reclassified even if their pixels did not change.
+        """
+        fingerprints = self._fingerprint(squares)
+        full_refresh = (
+            self.fingerprints is None
+            or self.fingerprints.shape != fingerprints.shape
+            or self.frames_since_refresh >= self.full_refresh_frames
+        )
+
+        if full_refresh:
+            self.labels, self.scores = self.classifier.classify(squares, threshold)
+            self.changed = list(range(len(squares)))
+            self.fingerprints = fingerprints
+            self.frames_since_refresh = 0
+        else:
+            # Against each square as it was last classified, so a change made in small steps still adds up.
+            diff = np.abs(fingerprints - self.fingerprints).reshape(len(squares), -1).mean(axis=1)
+            self.changed = sorted(set(np.flatnonzero(diff > self.change_threshold).tolist()) | set(force))
+            if self.changed:
+                labels, scores = self.classifier.classify(squares[self.changed], threshold, self.changed)
+                # Fresh arrays: callers may still hold the previous frame's.
+                self.labels = list(self.labels)
+                self.scores = self.scores.copy()
+                for i, label, row in zip(self.changed, labels, scores):
+                    self.labels[i] = label
+                    self.scores[i] = row
+                    self.fingerprints[i] = fingerprints[i]
+            self.frames_since_refresh += 1
+
+        return self.labels, self.scores
@@ -0,0 +1,175 @@
+# benchmark.py - times every pipeline stage on synthetic boards.
+#
+#   python benchmark.py --sizes 320 480 640 800 --repeats 50
+#
+# Boards are rendered from FENs with the templates in PIECE_THEME, so no
+# screen, browser or Stockfish install is needed. The engine stage runs
+# against stub_uci.py unless --engine points at a real UCI binary.
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+import chess
+import chess.engine
+
+from config import PIECE_THEME, CONFIDENCE_THRESHOLD
+from synthetic_board import load_theme, render_board, render_screen
+from capture import ReplayCapture
+from board_locator import BoardLocator
+from template_store import TemplateStore
+from classifier_pool import ClassifierPool
+from batch_classifier import BatchClassifier, IncrementalClassifier, split_squares, labels_to_fen
+from cascade_classifier import CascadeClassifier
+from move_inference import find_move_sequence
+from analysis import StopConditions, analyse
+
+BASE_FEN = "r1bqkbnr/1ppp1ppp/p1n5/1B2p3/4P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 0 4"
+NEXT_MOVES = ["Ba4", "Nf6"]
+
+def measure(fn, repeats, warmup=2):
+    """Runs fn repeatedly and returns the wall-clock time of each run in seconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def summarize(stage, size, samples):
+    samples = np.asarray(samples)
+    return {
+        "stage": stage,
+        "size": size,
+        "runs": len(samples),
+        "p50_ms": float(np.percentile(samples, 50) * 1000),
+        "p99_ms": float(np.percentile(samples, 99) * 1000),
+        "per_sec": float(len(samples) / samples.sum()) if samples.sum() > 0 else float("inf"),
+    }
+
+def load_store(theme_path):
+    store = TemplateStore()
+    for code, img in load_theme(theme_path).items():
+        store.add(code, img[:, :, :3], img[:, :, 3])
+    return store
+
+def bench_size(size, args, theme, store):
+    """Times the recognition stages for one board size; returns result rows."""
+    rows = []
+    board = chess.Board(BASE_FEN)
+    after_one = board.copy()
+    after_one.push_san(NEXT_MOVES[0])
+    after_two = after_one.copy()
+    after_two.push_san(NEXT_MOVES[1])
+    render = lambda b, **kw: render_board(b.board_fen(), theme, size=size, noise=args.noise,
+                                          scale=args.scale, **kw)
+    board_img = render(board)
+    next_img = render(after_one, highlights=["b5", "a4"] if args.highlights else ())
+    screen, region = render_screen(board_img)
+
+    with tempfile.TemporaryDirectory() as folder:
+        cv2.imwrite(os.path.join(folder, "screen.png"), screen)
+        replay = ReplayCapture(folder)
+        rows.append(summarize("capture_replay", size, measure(lambda: replay.grab(region), args.repeats)))
+
+    rows.append(summarize("localize_full", size, measure(lambda: BoardLocator().locate(screen), args.repeats)))
+    locator = BoardLocator()
+    locator.locate(screen)
+    rows.append(summarize("localize_cached", size, measure(lambda: locator.locate(screen), args.repeats)))
+
+    rows.append(summarize("split_squares", size, measure(lambda: split_squares(board_img), args.repeats)))
+    squares = split_squares(board_img)
+    next_squares = split_squares(next_img)
+
+    classifier = BatchClassifier(store)
+    per_square = lambda: [classifier.classify(sq[np.newaxis], CONFIDENCE_THRESHOLD) for sq in squares]
+    rows.append(summarize("classify_per_square", size, measure(per_square, max(args.repeats // 5, 3))))
+    rows.append(summarize("classify_batch", size,
+                          measure(lambda: classifier.classify(squares, CONFIDENCE_THRESHOLD), args.repeats)))
+    pool = ClassifierPool(args.workers, min_work=0)
+    parallel = BatchClassifier(store, pool)
+    rows.append(summarize("classify_parallel", size,
+                          measure(lambda: parallel.classify(squares, CONFIDENCE_THRESHOLD), args.repeats)))
+    pool.close()
+
+    cascade = CascadeClassifier(classifier)
+    cascade.calibrate(split_squares(render(chess.Board())))
+    rows.append(summarize("classify_cascade", size,
+                          measure(lambda: cascade.classify(squares, CONFIDENCE_THRESHOLD), args.repeats)))
+
+    incremental = IncrementalClassifier(cascade)
+    frames = [squares, next_squares]
+    counter = iter(range(10 ** 9))
+    alternate = lambda: incremental.classify(frames[next(counter) % 2], CONFIDENCE_THRESHOLD)
+    rows.append(summarize("classify_incremental", size, measure(alternate, args.repeats)))
+
+    labels, _ = classifier.classify(squares, CONFIDENCE_THRESHOLD)
+    rows.append(summarize("fen_assembly", size, measure(lambda: labels_to_fen(labels), args.repeats)))
+    recognized = labels_to_fen(labels)
+    if recognized != board.board_fen():
+        print(f"  ! size {size}: recognized {recognized}, expected {board.board_fen()}", file=sys.stderr)
+
+    rows.append(summarize("infer_move_1ply", size,
+                          measure(lambda: find_move_sequence(board, after_one.board_fen()), args.repeats)))
+    rows.append(summarize("infer_move_2ply", size,
+                          measure(lambda: find_move_sequence(board, after_two.board_fen()), args.repeats)))
+    return rows
+
+def bench_engine(args):
+    """Times a streamed analysis of the base position against a UCI engine."""
+    command = args.engine or [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_uci.py")]
+    engine = chess.engine.SimpleEngine.popen_uci(command)
+    try:
+        board = chess.Board(BASE_FEN)
+        stop = StopConditions(max_time=args.think_time, max_depth=args.depth)
+        samples = measure(lambda: analyse(engine, board, stop), max(args.repeats // 5, 3), warmup=1)
+        return [summarize("engine_analysis", "-", samples)]
+    finally:
+        engine.quit()
+
+def print_table(rows):
+    print(f"{'stage':<22}{'size':>6}{'runs':>6}{'p50 ms':>10}{'p99 ms':>10}{'per sec':>10}")
+    for row in rows:
+        print(f"{row['stage']:<22}{row['size']:>6}{row['runs']:>6}{row['p50_ms']:>10.3f}"
+              f"{row['p99_ms']:>10.3f}{row['per_sec']:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the recognition and analysis pipeline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[320, 480, 640, 800], help="board sizes in pixels")
+    parser.add_argument("--repeats", type=int, default=50, help="timed runs per stage")
+    parser.add_argument("--noise", type=float, default=0.0, help="Gaussian pixel noise (std dev)")
+    parser.add_argument("--scale", type=float, default=1.0, help="resize rendered boards by this factor")
+    parser.add_argument("--highlights", action="store_true", help="tint last-move squares in the second frame")
+    parser.add_argument("--workers", type=int, help="threads for the classify_parallel stage (default: one per core)")
+    parser.add_argument("--theme", default=PIECE_THEME, help="folder of 12 transparent piece PNGs")
+    parser.add_argument("--engine", nargs="+", help="UCI engine command (default: stub_uci.py)")
+    parser.add_argument("--depth", type=int, default=12, help="engine stage: max depth")
+    parser.add_argument("--think-time", type=float, default=1.0, help="engine stage: time cap in seconds")
+    parser.add_argument("--no-engine", action="store_true", help="skip the engine stage")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    theme = load_theme(args.theme)
+    if len(theme) < 12:
+        sys.exit(f"Need 12 transparent templates in '{args.theme}', found {len(theme)}.")
+    store = load_store(args.theme)
+
+    rows = []
+    for size in args.sizes:
+        rows += bench_size(size, args, theme, store)
+    if not args.no_engine:
+        rows += bench_engine(args)
+
+    print_table(rows)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
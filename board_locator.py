@@ -0,0 +1,139 @@
+# board_locator.py
+
+import cv2
+import numpy as np
+import logging
+
+def detect_board_rect(image):
+    """
+    Finds the largest quadrilateral contour in the image, assumed to be the
+    chessboard. Returns its bounding rectangle (x, y, w, h) or None.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    edges = cv2.Canny(blurred, 50, 150)
+
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    largest_area = 0
+    best_contour = None
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if area > largest_area:
+            peri = cv2.arcLength(contour, True)
+            approx = cv2.approxPolyDP(contour, 0.02 * peri, True)
+            if len(approx) == 4:
+                largest_area = area
+                best_contour = approx
+
+    if best_contour is None:
+        return None
+    return cv2.boundingRect(best_contour)
+
+def _lattice(profile, min_period):
+    """Best (offset, period, strength) of 9 evenly spaced peaks in a 1-D edge profile."""
+    n = len(profile)
+    max_period = n / 8.0
+    if max_period < min_period or max_period < 2:
+        return None
+    periods = np.arange(min_period, max_period + 0.25, 0.25)
+    ks = np.arange(9)
+    best = None
+    for period in periods:
+        offsets = np.arange(0, int(n - 8 * period))
+        if len(offsets) == 0:
+            offsets = np.array([0])
+        positions = np.minimum((offsets[:, None] + ks[None, :] * period).round().astype(int), n - 1)
+        strength = profile[positions].sum(axis=1)
+        i = int(strength.argmax())
+        if best is None or strength[i] > best[2]:
+            best = (int(offsets[i]), float(period), float(strength[i]))
+    return best
+
+def find_grid(board_img, min_fill=0.8, min_contrast=2.0):
+    """
+    Locates the 8x8 lattice inside a roughly cropped board from row/column
+    edge projection profiles. Returns (x, y, w, h) relative to the crop, or
+    None when no lattice stands out from the background.
+    """
+    gray = cv2.cvtColor(board_img, cv2.COLOR_BGR2GRAY).astype(np.float32)
+    col_profile = np.abs(np.diff(gray, axis=1)).sum(axis=0)
+    row_profile = np.abs(np.diff(gray, axis=0)).sum(axis=1)
+    # Edges between columns sit between pixels; pad so index k means "left edge of column k".
+    col_profile = np.concatenate(([0.0], col_profile, [0.0]))
+    row_profile = np.concatenate(([0.0], row_profile, [0.0]))
+
+    h, w = gray.shape
+    cols = _lattice(col_profile, min_fill * w / 8.0)
+    rows = _lattice(row_profile, min_fill * h / 8.0)
+    if cols is None or rows is None:
+        return None
+    # The lattice lines must be clearly stronger than an average column/row.
+    if cols[2] / 9 < min_contrast * col_profile.mean() or rows[2] / 9 < min_contrast * row_profile.mean():
+        return None
+    x, square_w = cols[0], cols[1]
+    y, square_h = rows[0], rows[1]
+    return x, y, int(round(8 * square_w)), int(round(8 * square_h))
+
+class BoardLocator:
+    """Finds the board once and keeps its rectangle while it stays put.
+
+    Every frame only the pixels along the cached border are checked: if the
+    edge energy there drops well below what it was when the board was
+    found, the board has moved or been covered and full detection runs again.
+    """
+
+    def __init__(self, min_edge_ratio=0.5, border_width=2):
+        self.rect = None
+        self.baseline_energy = None
+        self.min_edge_ratio = min_edge_ratio
+        self.border_width = border_width
+        self.detections = 0
+
+    def _border_energy(self, image, rect):
+        """Mean absolute step across the four sides of the rectangle."""
+        x, y, w, h = rect
+        b = self.border_width
+        img_h, img_w = image.shape[:2]
+        if x - b < 0 or y - b < 0 or x + w + b > img_w or y + h + b > img_h:
+            # Board touches the image edge: fall back to the inner border only.
+            b = 0
+        gray = cv2.cvtColor(image[max(y - b, 0):y + h + b, max(x - b, 0):x + w + b], cv2.COLOR_BGR2GRAY)
+        gray = gray.astype(np.int16)
+        if b == 0:
+            steps = [np.abs(np.diff(gray[:2], axis=0)), np.abs(np.diff(gray[-2:], axis=0)),
+                     np.abs(np.diff(gray[:, :2], axis=1)), np.abs(np.diff(gray[:, -2:], axis=1))]
+        else:
+            steps = [np.abs(gray[b - 1] - gray[b]), np.abs(gray[-b] - gray[-b - 1]),
+                     np.abs(gray[:, b - 1] - gray[:, b]), np.abs(gray[:, -b] - gray[:, -b - 1])]
+        return float(np.mean([s.mean() for s in steps]))
+
+    def detect(self, image):
+        """Runs full detection and refines it to the exact 8x8 lattice."""
+        self.detections += 1
+        rect = detect_board_rect(image)
+        if rect is None:
+            return None
+        x, y, w, h = rect
+        grid = find_grid(image[y:y+h, x:x+w])
+        if grid is not None:
+            gx, gy, gw, gh = grid
+            rect = (x + gx, y + gy, gw, gh)
+        return rect
+
+    def locate(self, image):
+        """Returns the board rectangle (x, y, w, h), re-detecting only when the cached one fails."""
+        if self.rect is not None:
+            energy = self._border_energy(image, self.rect)
+            if energy >= self.min_edge_ratio * self.baseline_energy:
+                return self.rect
+            logging.info("Board border changed; re-detecting the chessboard.")
+
+        self.rect = self.detect(image)
+        if self.rect is not None:
+            self.baseline_energy = max(self._border_energy(image, self.rect), 1e-6)
+        return self.rect
+
+    def invalidate(self):
+        self.rect = None
+        self.baseline_energy = None
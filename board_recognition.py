@@ -4,45 +4,77 @@ import numpy as np
 import chess
 import os
 import logging
-from config import PIECE_THEME, CONFIDENCE_THRESHOLD, DEBUG_MODE, LAST_BOARD_IMG_PATH
+from config import (PIECE_THEME, CONFIDENCE_THRESHOLD, DEBUG_MODE, LAST_BOARD_IMG_PATH, TEMPLATE_CACHE_SIZE,
+                    RECOGNITION_WORKERS, RECOGNITION_BACKEND, RECOGNITION_MIN_WORK)
+from metrics import METRICS, PROFILE
+from template_store import TemplateStore
+from theme_pack import load_pack
+from classifier_pool import ClassifierPool
+from batch_classifier import BatchClassifier, split_squares, labels_to_fen, confidence_margins
+from board_locator import BoardLocator
 
-# Load piece templates
-PIECE_TEMPLATES = {}
-for filename in os.listdir(PIECE_THEME):
-    if filename.endswith(".png"):
-        piece_code = filename.split('.')[0]
-        path = os.path.join(PIECE_THEME, filename)
-        template = cv2.imread(path, cv2.IMREAD_COLOR)
-        if template is None:
-            logging.warning(f"Could not load template image: {path}")
-            continue
-        PIECE_TEMPLATES[piece_code] = template
-        logging.info(f"Loaded template for piece: {piece_code}")
+def _load_png_templates(store):
+    """Decodes every template PNG in PIECE_THEME into the store."""
+    for filename in os.listdir(PIECE_THEME):
+        if filename.endswith(".png"):
+            piece_code = filename.split('.')[0]
+            path = os.path.join(PIECE_THEME, filename)
+            template = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+            if template is None:
+                logging.warning(f"Could not load template image: {path}")
+                continue
+            if template.ndim == 3 and template.shape[2] == 4:
+                mask = template[:, :, 3]
+            else:
+                # Opaque template: match every pixel.
+                mask = np.full(template.shape[:2], 255, dtype=np.uint8)
+            if template.ndim == 2:
+                template = cv2.cvtColor(template, cv2.COLOR_GRAY2BGR)
+            store.add(piece_code, template[:, :, :3], mask)
+            logging.info(f"Loaded template for piece: {piece_code}")
+
+# Templates, classifier and locator are created on first use, so importing
+# this module costs nothing until a board is actually recognized.
+PIECE_TEMPLATES = None
+CLASSIFIER = None
+_LOCATOR = None
+# Confidence margin of every square (a8 first) in the last image_to_fen() call.
+LAST_CONFIDENCE = None
+
+def load_templates():
+    """Loads the piece templates, from the compiled theme pack if there is one. Safe to call again."""
+    global PIECE_TEMPLATES, CLASSIFIER
+    if CLASSIFIER is not None:
+        return CLASSIFIER
+    with PROFILE.step("load templates"):
+        store = TemplateStore(TEMPLATE_CACHE_SIZE)
+        pack = load_pack(PIECE_THEME)
+        if pack is not None and len(pack.codes) >= 12:
+            store.load_pack(pack)
+            logging.info(f"Loaded {len(store)} templates from the theme pack.")
+        else:
+            _load_png_templates(store)
+    PIECE_TEMPLATES = store
+    CLASSIFIER = BatchClassifier(store, ClassifierPool(RECOGNITION_WORKERS, RECOGNITION_BACKEND,
+                                                       RECOGNITION_MIN_WORK))
+    return CLASSIFIER
+
+def _get_locator():
+    """Creates the board locator once and reuses its cached board position."""
+    global _LOCATOR
+    if _LOCATOR is None:
+        _LOCATOR = BoardLocator()
+    return _LOCATOR
 
 def find_chessboard(image):
     """
-    Finds the largest square contour in the image, assumed to be the chessboard.
-    Returns the cropped chessboard image.
+    Finds the chessboard in the image and returns the cropped 8x8 lattice.
+    The location is cached by the locator and only re-detected when its border
+    no longer matches.
     """
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-    edges = cv2.Canny(blurred, 50, 150)
-
-    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    
-    largest_area = 0
-    best_contour = None
-    for contour in contours:
-        area = cv2.contourArea(contour)
-        if area > largest_area:
-            peri = cv2.arcLength(contour, True)
-            approx = cv2.approxPolyDP(contour, 0.02 * peri, True)
-            if len(approx) == 4:
-                largest_area = area
-                best_contour = approx
-    
-    if best_contour is not None:
-        x, y, w, h = cv2.boundingRect(best_contour)
+    rect = _get_locator().locate(image)
+    if rect is not None:
+        x, y, w, h = rect
         return image[y:y+h, x:x+w]
     
     logging.warning("Chessboard not detected.")
@@ -52,23 +84,8 @@ def identify_piece(square_img):
     """
     Identifies a piece on a given square image using template matching.
     """
-    best_match = None
-    max_val = CONFIDENCE_THRESHOLD  # Start with the threshold
-
-    # Use the alpha channel for matching if available
-    for piece_code, template in PIECE_TEMPLATES.items():
-        # Ensure template is not larger than the square
-        if template.shape[0] > square_img.shape[0] or template.shape[1] > square_img.shape[1]:
-            continue
-
-        res = cv2.matchTemplate(square_img, template, cv2.TM_CCOEFF_NORMED)
-        _, current_max, _, _ = cv2.minMaxLoc(res)
-
-        if current_max > max_val:
-            max_val = current_max
-            best_match = piece_code
-            
-    return best_match
+    labels, _ = load_templates().classify(square_img[np.newaxis], CONFIDENCE_THRESHOLD)
+    return labels[0]
 
 def image_to_fen(image, is_flipped=False):
     """
@@ -81,38 +98,13 @@ def image_to_fen(image, is_flipped=False):
     if DEBUG_MODE:
         cv2.imwrite(LAST_BOARD_IMG_PATH, board_img)
 
-    square_height = board_img.shape[0] // 8
-    square_width = board_img.shape[1] // 8
-    
-    fen = ""
-    for r in range(8):
-        empty_count = 0
-        for c in range(8):
-            actual_r, actual_c = (7 - r, 7 - c) if is_flipped else (r, c)
-            
-            x1, y1 = actual_c * square_width, actual_r * square_height
-            x2, y2 = x1 + square_width, y1 + square_height
-            square = board_img[y1:y2, x1:x2]
-            
-            piece = identify_piece(square)
-            
-            if piece:
-                if empty_count > 0:
-                    fen += str(empty_count)
-                    empty_count = 0
-                
-                piece_char = piece[1] # e.g., 'P' from 'wP'
-                if piece[0] == 'b':
-                    fen += piece_char.lower()
-                else:
-                    fen += piece_char.upper()
-            else:
-                empty_count += 1
-        
-        if empty_count > 0:
-            fen += str(empty_count)
-        if r < 7:
-            fen += '/'
+    global LAST_CONFIDENCE
+    with METRICS.timer("recognize"):
+        labels, scores = load_templates().classify(split_squares(board_img), CONFIDENCE_THRESHOLD)
+    METRICS.incr("frames")
+    fen = labels_to_fen(labels, is_flipped)
+    margins = confidence_margins(scores, CONFIDENCE_THRESHOLD)
+    LAST_CONFIDENCE = margins[::-1] if is_flipped else margins
             
     # NOTE: This is a simplified FEN. It doesn't include turn, castling, en passant.
     # The engine can often work with just the board state, but for accuracy, this would
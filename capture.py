@@ -0,0 +1,88 @@
+# capture.py
+
+import os
+import logging
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+class MssCapture:
+    """Grabs the screen through one persistent mss session.
+
+    Frames are NumPy views over mss's BGRA buffer, so no PIL image is built
+    and the pixels are not copied after mss reads them.
+    The session is bound to the thread that created it on some platforms,
+    so create the capture on the thread that grabs.
+    """
+
+    def __init__(self):
+        import mss
+        self.sct = mss.mss()
+
+    def grab_bgra(self, region=None):
+        """Returns an (h, w, 4) BGRA view of the region (x, y, w, h), or the primary monitor."""
+        if region is None:
+            monitor = self.sct.monitors[1]
+        else:
+            x, y, w, h = region
+            monitor = {"left": int(x), "top": int(y), "width": int(w), "height": int(h)}
+        shot = self.sct.grab(monitor)
+        return np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+
+    def grab(self, region=None):
+        """Returns a BGR view of the region, ready for OpenCV-style processing."""
+        return self.grab_bgra(region)[:, :, :3]
+
+    def close(self):
+        self.sct.close()
+
+class ReplayCapture:
+    """Serves frames from an image file or a folder of images instead of the screen.
+
+    Regions are cropped from each stored frame, so code written against the
+    live backend runs unchanged and headless.
+    """
+
+    def __init__(self, source, loop=True):
+        if os.path.isdir(source):
+            paths = sorted(
+                os.path.join(source, f) for f in os.listdir(source) if f.lower().endswith(IMAGE_EXTENSIONS)
+            )
+        else:
+            paths = [source]
+        self.frames = []
+        for path in paths:
+            img = cv2.imread(path, cv2.IMREAD_COLOR)
+            if img is None:
+                logging.warning(f"Could not load replay frame: {path}")
+                continue
+            self.frames.append(img)
+        if not self.frames:
+            raise ValueError(f"No replay frames found in '{source}'.")
+        self.loop = loop
+        self.index = 0
+
+    def grab(self, region=None):
+        """Returns the next stored frame, cropped to the region (x, y, w, h) if given."""
+        if self.index >= len(self.frames):
+            if not self.loop:
+                return None
+            self.index = 0
+        frame = self.frames[self.index]
+        self.index += 1
+        if region is None:
+            return frame
+        x, y, w, h = region
+        return frame[y:y+h, x:x+w]
+
+    def close(self):
+        self.frames = []
+
+def create_capture(backend="mss", replay_path=None):
+    """Creates the capture backend named in the configuration."""
+    if backend == "replay":
+        return ReplayCapture(replay_path)
+    if backend == "mss":
+        return MssCapture()
+    raise ValueError(f"Unknown capture backend: {backend}")
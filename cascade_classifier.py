@@ -0,0 +1,145 @@
+# cascade_classifier.py
+
+import logging
+import numpy as np
+
+# Start position as seen on screen, top row first, when White is at the bottom.
+START_LAYOUT = (
+    ['bR', 'bN', 'bB', 'bQ', 'bK', 'bB', 'bN', 'bR'] + ['bP'] * 8 + [None] * 32 +
+    ['wP'] * 8 + ['wR', 'wN', 'wB', 'wQ', 'wK', 'wB', 'wN', 'wR']
+)
+
+class CascadeClassifier:
+    """Classifies squares in stages, only template-matching what is left.
+
+    1. Empty test: against the known light/dark background colour of the
+       square, how much of its centre is foreground and how much edge
+       energy it has. Empty squares stop here. Their score row is not
+       matched but holds how close the test came to calling them occupied,
+       scaled to the threshold, so confidence_margins still measures it.
+    2. Colour test: the mean brightness of the foreground picks white or black.
+    3. Masked template match against the six templates of that colour only
+       (all twelve if the colour test is too close to call).
+
+    Until calibrate() has seen a start-position capture the thresholds are
+    unknown, so every square goes straight to the full 12-template match.
+    """
+
+    def __init__(self, classifier, margin=0.15, color_margin=0.1, sample_size=16):
+        self.classifier = classifier
+        self.margin = margin
+        self.sample_size = sample_size
+        self.color_margin = color_margin
+        self.calibrated = False
+        self.backgrounds = None
+        self.bg_tolerance = None
+        self.fg_threshold = None
+        self.edge_threshold = None
+        self.color_threshold = None
+        self.color_spread = None
+        self.white_is_bright = True
+        self.stage_counts = {"empty": 0, "colour": 0, "full": 0}
+
+    def _inner(self, squares):
+        h, w = squares.shape[1:3]
+        mh, mw = int(h * self.margin), int(w * self.margin)
+        # A fixed-size sample keeps the fast path's cost independent of square size.
+        step_y = max(1, (h - 2 * mh) // self.sample_size)
+        step_x = max(1, (w - 2 * mw) // self.sample_size)
+        return squares[:, mh:h - mh:step_y, mw:w - mw:step_x].astype(np.float32)
+
+    def _features(self, squares, indices):
+        """Foreground fraction, edge energy and foreground brightness of each square."""
+        inner = self._inner(squares)
+        n = len(inner)
+        rows, cols = np.divmod(np.asarray(indices), 8)
+        backgrounds = self.backgrounds[(rows + cols) % 2]
+        # Per-channel arithmetic: numpy reduces a trailing axis of 3 very slowly.
+        b, g, r = inner[..., 0], inner[..., 1], inner[..., 2]
+        distance = np.abs(b - backgrounds[:, None, None, 0]) + np.abs(g - backgrounds[:, None, None, 1]) + \
+            np.abs(r - backgrounds[:, None, None, 2])
+        foreground = distance.reshape(n, -1) > self.bg_tolerance
+        fg_fraction = foreground.mean(axis=1)
+
+        gray = (b + g + r) / 3
+        edges = np.abs(np.diff(gray, axis=1)).reshape(n, -1).mean(axis=1) + \
+            np.abs(np.diff(gray, axis=2)).reshape(n, -1).mean(axis=1)
+        fg_count = np.maximum(foreground.sum(axis=1), 1)
+        brightness = (gray.reshape(n, -1) * foreground).sum(axis=1) / fg_count
+        return fg_fraction, edges, brightness
+
+    def calibrate(self, squares, is_flipped=False):
+        """Derives every stage threshold from the 64 squares of a start-position capture."""
+        layout = START_LAYOUT[::-1] if is_flipped else START_LAYOUT
+        empty = np.array([i for i, p in enumerate(layout) if p is None])
+        white = np.array([i for i, p in enumerate(layout) if p and p[0] == 'w'])
+        black = np.array([i for i, p in enumerate(layout) if p and p[0] == 'b'])
+
+        # Background colour per square parity (0 = light, top-left), from the empty middle rows.
+        inner = self._inner(squares)
+        parity = (empty // 8 + empty % 8) % 2
+        self.backgrounds = np.stack(
+            [np.median(inner[empty[parity == p]], axis=(0, 1, 2)) for p in (0, 1)]).astype(np.float32)
+        distance = np.abs(inner[empty] - self.backgrounds[parity][:, None, None, :]).sum(axis=3)
+        self.bg_tolerance = max(30.0, 1.5 * float(np.percentile(distance, 99)))
+
+        all_squares = np.arange(64)
+        fg_fraction, edges, brightness = self._features(squares, all_squares)
+        occupied = np.concatenate([white, black])
+        if fg_fraction[occupied].min() <= fg_fraction[empty].max() and edges[occupied].min() <= edges[empty].max():
+            logging.warning("Calibration failed: empty and occupied squares overlap. Using full matching.")
+            self.calibrated = False
+            return False
+        self.fg_threshold = (fg_fraction[empty].max() + fg_fraction[occupied].min()) / 2
+        self.edge_threshold = (edges[empty].max() + edges[occupied].min()) / 2
+
+        white_mean, black_mean = brightness[white].mean(), brightness[black].mean()
+        self.white_is_bright = white_mean > black_mean
+        self.color_threshold = (white_mean + black_mean) / 2
+        self.color_spread = max(abs(white_mean - black_mean), 1e-6)
+        self.calibrated = True
+        logging.info(
+            f"Cascade calibrated: fg>{self.fg_threshold:.3f}, edges>{self.edge_threshold:.1f}, "
+            f"colour split at {self.color_threshold:.1f}."
+        )
+        return True
+
+    def classify(self, squares, threshold, indices=None):
+        """Same contract as BatchClassifier.classify."""
+        if not self.calibrated:
+            self.stage_counts["full"] += len(squares)
+            return self.classifier.classify(squares, threshold)
+        if indices is None:
+            indices = range(len(squares))
+
+        n, h, w = squares.shape[:3]
+        codes = self.classifier.codes(w, h)
+        labels = [None] * n
+        scores = np.zeros((n, len(codes)), dtype=np.float32)
+
+        fg_fraction, edges, brightness = self._features(squares, indices)
+        occupied = (fg_fraction > self.fg_threshold) | (edges > self.edge_threshold)
+        self.stage_counts["empty"] += int(n - occupied.sum())
+        closeness = np.maximum(fg_fraction / max(self.fg_threshold, 1e-6), edges / max(self.edge_threshold, 1e-6))
+        scores[~occupied] = threshold * np.minimum(closeness[~occupied], 1.0)[:, None]
+
+        offset = (brightness - self.color_threshold) / self.color_spread
+        is_white = (offset > 0) == self.white_is_bright
+        decided = np.abs(offset) >= self.color_margin
+
+        groups = (
+            (occupied & decided & is_white, [i for i, c in enumerate(codes) if c[0] == 'w'], "colour"),
+            (occupied & decided & ~is_white, [i for i, c in enumerate(codes) if c[0] == 'b'], "colour"),
+            (occupied & ~decided, list(range(len(codes))), "full"),
+        )
+        for mask, columns, stage in groups:
+            rows = np.flatnonzero(mask)
+            if len(rows) == 0:
+                continue
+            self.stage_counts[stage] += len(rows)
+            group_codes, group_scores = self.classifier.score(squares[rows], columns)
+            scores[np.ix_(rows, columns)] = group_scores
+            best = group_scores.argmax(axis=1)
+            for row, b, s in zip(rows, best, group_scores[np.arange(len(rows)), best]):
+                labels[row] = group_codes[b] if s > threshold else None
+        return labels, scores
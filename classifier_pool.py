@@ -0,0 +1,83 @@
+# classifier_pool.py
+
+import os
+import logging
+import numpy as np
+
+# Set in each worker process by _init_worker.
+_WORKER_CLASSIFIER = None
+
+def _init_worker(templates, max_sizes):
+    """Builds the worker process's own classifier from the full-size templates."""
+    global _WORKER_CLASSIFIER
+    from template_store import TemplateStore
+    from batch_classifier import BatchClassifier
+    store = TemplateStore(max_sizes)
+    for code, (template, mask) in templates.items():
+        store.add(code, template, mask)
+    _WORKER_CLASSIFIER = BatchClassifier(store)
+
+def _score_in_worker(squares, columns):
+    return _WORKER_CLASSIFIER.score(squares, columns)
+
+class ClassifierPool:
+    """Scores a stack of squares on several cores at once.
+
+    The stack is cut into one contiguous chunk of squares per worker (whole
+    ranks for a full board on eight workers) and the chunks' scores are
+    concatenated in square order. The chunking depends only on the batch
+    size and the worker count, so results are the same from frame to frame.
+
+    Threads are the default. The matrix products in BatchClassifier.score
+    run in BLAS with the GIL released, so every thread works on the one
+    shared template bank. With backend="process" each worker process keeps
+    its own copy of the templates and squares are pickled to it. That pays
+    off only where the numpy build holds the GIL. Batches smaller than
+    min_work pixels (squares x height x width) are scored on the calling
+    thread, because the hand-off would cost more than it saves. The
+    executor is created on first use.
+    """
+
+    def __init__(self, workers=None, backend="thread", min_work=32768):
+        if backend not in ("thread", "process"):
+            raise ValueError(f"Unknown classifier pool backend '{backend}'.")
+        self.workers = workers or os.cpu_count() or 1
+        self.backend = backend
+        self.min_work = min_work
+        self._executor = None
+
+    def worth(self, squares):
+        """True if the batch is large enough to split across workers."""
+        n, h, w = squares.shape[:3]
+        return self.workers > 1 and n > 1 and n * h * w >= self.min_work
+
+    def _start(self, classifier):
+        from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+        if self.backend == "thread":
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="classify")
+        else:
+            store = classifier.store
+            templates = {code: (np.asarray(store.templates[code]), np.asarray(store.masks[code]))
+                         for code in store.templates}
+            self._executor = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                                 initargs=(templates, store.max_sizes))
+        logging.info(f"Classifying squares on {self.workers} {self.backend}s.")
+
+    def score(self, classifier, squares, bank, columns=None):
+        """Same result as classifier._score(squares, bank, columns), computed chunk by chunk in parallel."""
+        if self._executor is None:
+            self._start(classifier)
+        chunks = np.array_split(np.arange(len(squares)), min(self.workers, len(squares)))
+        if self.backend == "thread":
+            futures = [self._executor.submit(classifier._score, squares[c[0]:c[-1] + 1], bank, columns)
+                       for c in chunks]
+        else:
+            futures = [self._executor.submit(_score_in_worker, np.ascontiguousarray(squares[c[0]:c[-1] + 1]), columns)
+                       for c in chunks]
+        results = [future.result() for future in futures]
+        return results[0][0], np.concatenate([scores for _, scores in results])
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
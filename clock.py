@@ -0,0 +1,116 @@
+# clock.py
+
+import os
+import logging
+import cv2
+import numpy as np
+
+# Size every digit glyph is scaled to before it is compared.
+GLYPH_SIZE = (16, 24)
+
+def _binarize(img):
+    """Glyph pixels as 255 on 0, whichever way round the clock draws its text."""
+    gray = img if img.ndim == 2 else cv2.cvtColor(np.ascontiguousarray(img[:, :, :3]), cv2.COLOR_BGR2GRAY)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # The text covers less of the clock than its background does.
+    return binary if np.count_nonzero(binary) < binary.size / 2 else 255 - binary
+
+def _glyph(binary, box):
+    x, y, w, h = box
+    return cv2.resize(binary[y:y+h, x:x+w], GLYPH_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+class ClockReader:
+    """Reads the time left on a chess clock, e.g. "4:59", "0:09.7" or "1:02:30", from a screen region.
+
+    Digits are matched against templates cropped from the site's own clock:
+    digits_path holds 0.png to 9.png, one digit each. A colon shows up as
+    two small blobs above each other and a decimal point as one.
+    """
+
+    def __init__(self, digits_path, region=None, min_score=0.6):
+        self.digits_path = digits_path
+        self.region = region
+        self.min_score = min_score
+        self.digits = {}
+
+    def load_digits(self):
+        """Loads the ten digit templates. Returns False if any is missing."""
+        for digit in "0123456789":
+            img = cv2.imread(os.path.join(self.digits_path, f"{digit}.png"), cv2.IMREAD_COLOR)
+            if img is None:
+                logging.error(f"Missing clock digit template: {os.path.join(self.digits_path, f'{digit}.png')}")
+                return False
+            binary = _binarize(img)
+            points = cv2.findNonZero(binary)
+            if points is None:
+                logging.error(f"Clock digit template '{digit}.png' is blank.")
+                return False
+            self.digits[digit] = _glyph(binary, cv2.boundingRect(points))
+        return True
+
+    def select_region(self, capture):
+        """Lets the user draw the clock's region on a screenshot."""
+        logging.info("A window will appear. Draw a rectangle around YOUR clock.")
+        try:
+            img = np.ascontiguousarray(capture.grab())
+            roi = cv2.selectROI("Select Clock Region", img, fromCenter=False, showCrosshair=True)
+            cv2.destroyAllWindows()
+            if roi[2] == 0 or roi[3] == 0:
+                return False
+            self.region = roi
+            logging.info(f"Clock region selected: {self.region}")
+            return True
+        except Exception as e:
+            logging.error(f"Could not select the clock region: {e}")
+            return False
+
+    def read(self, capture):
+        """Seconds left on the clock, or None if it cannot be read."""
+        if self.region is None or not self.digits:
+            return None
+        img = capture.grab(self.region)
+        return None if img is None else self.parse(img)
+
+    def parse(self, img):
+        """Seconds shown in an image of the clock, or None if it cannot be read."""
+        binary = _binarize(img)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(binary)
+        boxes = [tuple(stats[i, :4]) for i in range(1, count)]
+        if not boxes:
+            return None
+        digit_height = max(h for _, _, _, h in boxes)
+        # Specks far smaller than a colon dot are noise.
+        min_area = max(2, (digit_height // 10) ** 2)
+        boxes = sorted(box for i, box in enumerate(boxes, 1) if stats[i, cv2.CC_STAT_AREA] >= min_area)
+
+        text = []
+        i = 0
+        while i < len(boxes):
+            x, y, w, h = boxes[i]
+            if h >= digit_height * 0.6:
+                scores = {digit: float(cv2.matchTemplate(_glyph(binary, boxes[i]), template, cv2.TM_CCOEFF_NORMED)[0, 0])
+                          for digit, template in self.digits.items()}
+                digit = max(scores, key=scores.get)
+                if scores[digit] < self.min_score:
+                    return None
+                text.append(digit)
+                i += 1
+                continue
+            # Separator: blobs that overlap this one horizontally belong to it.
+            j = i + 1
+            while j < len(boxes) and boxes[j][3] < digit_height * 0.6 and boxes[j][0] < x + w:
+                j += 1
+            text.append(":" if j - i >= 2 else ".")
+            i = j
+        return self._seconds("".join(text))
+
+    @staticmethod
+    def _seconds(text):
+        whole, _, fraction = text.partition(".")
+        parts = whole.split(":")
+        if not all(part.isdigit() for part in parts) or (fraction and not fraction.isdigit()):
+            return None
+        seconds = 0
+        for part in parts:
+            seconds = seconds * 60 + int(part)
+        return seconds + (float(f"0.{fraction}") if fraction else 0.0)
@@ -11,8 +11,142 @@ PIECE_THEME = 'pieces/my_pieces/'
 #    If it sees pieces that aren't there, RAISE this value (e.g., to 0.75).
 CONFIDENCE_THRESHOLD = 0.7
 
-# 4. Time in seconds between screen captures.
+# 4. Longest time in seconds between polls of the board once it has been
+#    idle for a while (see 15). Recognition itself only runs on a change.
 CAPTURE_INTERVAL = 1.5
 
-# 5. Time in seconds for the engine to think.
-STOCKFISH_THINK_TIME = 1.0
\ No newline at end of file
+# 5. Normal time in seconds for the engine to think; see 23 for how it is
+#    shortened or stretched per position.
+STOCKFISH_THINK_TIME = 1.0
+
+# 6. Number of distinct square sizes to keep pre-scaled templates for.
+#    Only matters if the board window is resized while running.
+TEMPLATE_CACHE_SIZE = 4
+
+# 7. Mean pixel difference above which a square is treated as changed and
+#    reclassified. Squares below it keep their label from the previous frame.
+SQUARE_CHANGE_THRESHOLD = 8.0
+
+# 8. Reclassify every square after this many incremental frames, to guard
+#    against slow drift (e.g. a highlight fading in over several frames).
+FULL_REFRESH_FRAMES = 20
+
+# 9. Screen capture backend: "mss" grabs the live screen, "replay" reads
+#    frames from CAPTURE_REPLAY_PATH (an image or a folder) for headless runs.
+CAPTURE_BACKEND = "mss"
+CAPTURE_REPLAY_PATH = "debug/"
+
+# 10. Streaming analysis stops early once the best move and eval (within
+#     ANALYSIS_STABLE_MARGIN centipawns) hold for ANALYSIS_STABLE_ITERATIONS
+#     depths past ANALYSIS_MIN_DEPTH, or at ANALYSIS_MAX_DEPTH.
+ANALYSIS_MAX_DEPTH = 30
+ANALYSIS_MIN_DEPTH = 10
+ANALYSIS_STABLE_ITERATIONS = 4
+ANALYSIS_STABLE_MARGIN = 15
+
+# 11. Finished analyses are cached by position in memory and in this SQLite
+#     file. A cached result at least ANALYSIS_CACHE_DEPTH deep is reused as is;
+#     a shallower one is shown at once while the engine searches deeper.
+#     Set ANALYSIS_CACHE_PATH to None to keep the cache in memory only.
+ANALYSIS_CACHE_PATH = "analysis_cache.sqlite3"
+ANALYSIS_CACHE_SIZE = 10000
+ANALYSIS_CACHE_DEPTH = 20
+
+# 12. Pipeline metrics (stage latencies and counters). Off by default; when on,
+#     a JSON snapshot is written every METRICS_INTERVAL seconds and, if
+#     METRICS_PORT is set, a plain-text summary is served on 127.0.0.1.
+METRICS_ENABLED = False
+METRICS_SNAPSHOT_PATH = "metrics.json"
+METRICS_INTERVAL = 30.0
+METRICS_PORT = None
+
+# 13. While the opponent thinks, the engine predicts their PONDER_REPLIES most
+#     likely replies (searching for PONDER_PREDICT_TIME seconds) and analyses
+#     our answer to each into the analysis cache. Set PONDER_REPLIES to 0 to
+#     leave the engine idle instead.
+PONDER_REPLIES = 3
+PONDER_PREDICT_TIME = 0.3
+
+# 14. Engine pool for offline batch analysis (annotate.py). ENGINE_POOL_SIZE
+#     processes (None = one per CPU core), each with ENGINE_THREADS search
+#     threads and ENGINE_HASH_MB of hash.
+ENGINE_POOL_SIZE = None
+ENGINE_THREADS = 1
+ENGINE_HASH_MB = 64
+
+# 15. The board region is polled every CAPTURE_POLL_INTERVAL seconds through a
+#     small perceptual hash; full recognition runs once the hash has changed
+#     and then held for CAPTURE_DEBOUNCE seconds (skipping piece animations).
+#     After CAPTURE_IDLE_AFTER idle seconds polling slows towards CAPTURE_INTERVAL.
+CAPTURE_POLL_INTERVAL = 0.05
+CAPTURE_DEBOUNCE = 0.15
+CAPTURE_IDLE_AFTER = 30.0
+
+# 16. Optional polyglot opening book (.bin file) and folder of Syzygy tables.
+#     Positions they cover are answered from them at once, without the engine.
+OPENING_BOOK_PATH = None
+SYZYGY_PATH = None
+
+# 17. Multi-board mode (multiboard.py). Boards are analysed on the engine pool
+#     (section 14), the most recently changed first; a position that has waited
+#     MULTIBOARD_MAX_WAIT seconds is served before newer ones.
+MULTIBOARD_MAX_WAIT = 3.0
+
+# 18. Debug output of the simple assistant (main.py). With DEBUG_MODE on, the
+#     board cropped from each recognized frame is saved to LAST_BOARD_IMG_PATH.
+DEBUG_MODE = False
+DEBUG_DIR = "debug"
+LAST_BOARD_IMG_PATH = "debug/last_board.png"
+
+# 19. Square classification can be split across RECOGNITION_WORKERS threads
+#     (None = one per CPU core, 1 = off) once a batch holds at least
+#     RECOGNITION_MIN_WORK pixels; smaller batches are scored serially.
+#     RECOGNITION_BACKEND "process" uses worker processes instead of threads.
+#     Off by default: each thread's matrix products may start their own BLAS
+#     threads. Turn it on only if `python benchmark.py --workers N` shows
+#     classify_parallel beating classify_batch on your machine.
+RECOGNITION_WORKERS = 1
+RECOGNITION_BACKEND = "thread"
+RECOGNITION_MIN_WORK = 32768
+
+# 20. Pipeline mode (assistant.py --pipeline): one capture process writes
+#     settled frames into a shared-memory ring of PIPELINE_SLOTS frames and
+#     PIPELINE_WORKERS recognition processes read them in place.
+PIPELINE_WORKERS = 2
+PIPELINE_SLOTS = 8
+
+# 21. A recognized position only reaches move inference and the engine once
+#     every changed square has settled: its confidence margin is at least
+#     STABILIZER_MARGIN, or its last STABILIZER_FRAMES readings agree. While a
+#     square is unsettled the board is re-read every STABILIZER_RECHECK seconds.
+#     Set STABILIZER_FRAMES to 1 to pass every reading straight through.
+STABILIZER_FRAMES = 3
+STABILIZER_MARGIN = 0.15
+STABILIZER_RECHECK = 0.1
+
+# 22. Search threads and hash table size (MB) of the live engine. The games
+#     it analyses are sent with their move history, so a bigger hash carries
+#     more of one move's search over to the next. None keeps the default.
+STOCKFISH_THREADS = 2
+STOCKFISH_HASH_MB = 256
+
+# 23. Think time per position. A position with a single legal move is
+#     searched for TIME_FORCED seconds, one with at most TIME_FEW_MOVES legal
+#     moves for half of STOCKFISH_THINK_TIME. A search stops as soon as its
+#     best line leads the second by TIME_CLEAR_GAP centipawns past
+#     ANALYSIS_MIN_DEPTH. While the best move or eval (by more than
+#     TIME_UNSTABLE_MARGIN centipawns) still changes, it may run on to
+#     TIME_EXTEND times the think time.
+TIME_FORCED = 0.1
+TIME_FEW_MOVES = 4
+TIME_CLEAR_GAP = 150
+TIME_EXTEND = 2.5
+TIME_UNSTABLE_MARGIN = 40
+
+# 24. Optional clock reading (assistant.py --clock, or set CLOCK_REGION to the
+#     x, y, w, h of your clock). CLOCK_DIGITS_PATH holds 0.png ... 9.png cropped
+#     from the site's clock. No search then takes more than CLOCK_FRACTION of
+#     the time left.
+CLOCK_REGION = None
+CLOCK_DIGITS_PATH = "clock_digits/"
+CLOCK_FRACTION = 0.05
@@ -1,51 +1,126 @@
 # engine.py
 
 import chess
-import chess.engine
 import logging
-from config import STOCKFISH_PATH, STOCKFISH_THINK_TIME
+import threading
+from config import (STOCKFISH_PATH, STOCKFISH_THINK_TIME, ANALYSIS_MAX_DEPTH, ANALYSIS_MIN_DEPTH,
+                    ANALYSIS_STABLE_ITERATIONS, ANALYSIS_STABLE_MARGIN, ANALYSIS_CACHE_PATH,
+                    ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_DEPTH, PONDER_REPLIES, PONDER_PREDICT_TIME,
+                    OPENING_BOOK_PATH, SYZYGY_PATH, STOCKFISH_THREADS, STOCKFISH_HASH_MB, TIME_FORCED,
+                    TIME_FEW_MOVES, TIME_EXTEND, TIME_CLEAR_GAP, TIME_UNSTABLE_MARGIN, CLOCK_FRACTION)
+from metrics import PROFILE
+from analysis import StopConditions, analyse
+from time_manager import TimeManager
+from game_session import board_from_placement
 
 class Engine:
     def __init__(self):
         self.engine = None
+        self.cache = None
+        self.lookup = None
+        # Per-position limits around STOCKFISH_THINK_TIME.
+        self.stop_conditions = TimeManager(
+            StopConditions(max_time=STOCKFISH_THINK_TIME, max_depth=ANALYSIS_MAX_DEPTH,
+                           stable_iterations=ANALYSIS_STABLE_ITERATIONS, stable_margin=ANALYSIS_STABLE_MARGIN,
+                           min_depth=ANALYSIS_MIN_DEPTH),
+            TIME_FORCED, TIME_FEW_MOVES, TIME_EXTEND, TIME_CLEAR_GAP, TIME_UNSTABLE_MARGIN, CLOCK_FRACTION)
+        self.ponder_stop = StopConditions(max_time=PONDER_PREDICT_TIME, max_depth=ANALYSIS_MAX_DEPTH)
+        self._startup_thread = None
+        self._ready = False
     
     def startup(self):
         """Initializes the Stockfish engine."""
+        # Imported here so that entry points can show the region selection
+        # while asyncio, SQLite and the engine process load in the background.
         try:
-            self.engine = chess.engine.SimpleEngine.popen_uci(STOCKFISH_PATH)
+            with PROFILE.step("import engine modules"):
+                import chess.engine
+                from analysis_cache import AnalysisCache
+                from lookup import Lookup
+            with PROFILE.step("launch engine"):
+                self.engine = chess.engine.SimpleEngine.popen_uci(STOCKFISH_PATH)
+                options = {"Threads": STOCKFISH_THREADS, "Hash": STOCKFISH_HASH_MB}
+                self.engine.configure({name: value for name, value in options.items()
+                                       if value is not None and name in self.engine.options})
+            with PROFILE.step("open cache and lookup"):
+                self.cache = AnalysisCache(ANALYSIS_CACHE_PATH, ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_DEPTH)
+                self.lookup = Lookup(OPENING_BOOK_PATH, SYZYGY_PATH)
             logging.info("Stockfish engine initialized successfully.")
             return True
         except Exception as e:
             logging.error(f"Failed to initialize Stockfish: {e}")
             return False
 
-    def get_best_move(self, fen_pieces, turn_char):
-        """Gets the best move from a FEN and turn."""
+    def startup_in_background(self):
+        """Runs startup() on a background thread; wait_ready() collects the result."""
+        def run():
+            self._ready = self.startup()
+        self._startup_thread = threading.Thread(target=run, name="engine-startup", daemon=True)
+        self._startup_thread.start()
+
+    def wait_ready(self):
+        """Waits for startup_in_background() to finish. Returns True if the engine is running."""
+        if self._startup_thread is not None:
+            self._startup_thread.join()
+            self._startup_thread = None
+        return self._ready
+
+    def make_board(self, fen_pieces, turn_char):
+        """Builds a board from the piece placement and side to move."""
+        # Without the game's history, castle only with pieces still on their home squares.
+        return board_from_placement(fen_pieces, chess.BLACK if turn_char == 'b' else chess.WHITE)
+
+    def format_analysis(self, info, board):
+        """Turns multipv analysis into (best_move, top_moves_str)."""
+        if not info: return "No moves found", ""
+
+        top_moves = []
+        for item in info:
+            move = item.get('pv', [None])[0]
+            if move is None: continue
+            if 'score' not in item:
+                # Book and tablebase answers carry a label instead of a score.
+                top_moves.append(f"{move.uci()} ({item.get('label', '?')})")
+                continue
+            score = item['score'].pov(board.turn)
+            eval_str = f"Mate in {score.mate()}" if score.is_mate() else f"{score.score() / 100.0:+.2f}"
+            top_moves.append(f"{move.uci()} (Eval: {eval_str})")
+        if not top_moves: return "No moves found", ""
+
+        return top_moves[0].split(' ')[0], " | ".join(top_moves)
+
+    def get_best_move(self, fen_pieces, turn_char, on_update=None):
+        """Gets the best move from a FEN and turn, streaming progress to on_update."""
         try:
-            # For stateless analysis, we assume default castling rights.
-            full_fen = f"{fen_pieces} {turn_char} KQkq - 0 1"
-            board = chess.Board(full_fen)
-            
-            limit = chess.engine.Limit(time=STOCKFISH_THINK_TIME)
-            info = self.engine.analyse(board, limit, multipv=3)
-
-            if not info: return "No moves found", ""
-            
-            top_moves = []
-            for item in info:
-                move = item.get('pv', [None])[0]
-                if move is None: continue
-                score = item['score'].pov(board.turn)
-                eval_str = f"Mate in {score.mate()}" if score.is_mate() else f"{score.score() / 100.0:+.2f}"
-                top_moves.append(f"{move.uci()} (Eval: {eval_str})")
-            
-            return top_moves[0].split(' ')[0], " | ".join(top_moves)
+            return self.analyse_board(self.make_board(fen_pieces, turn_char), on_update)
+        except ValueError as e:
+            logging.error(f"Engine analysis failed: {e}")
+            return "Analysis Error", ""
+
+    def analyse_board(self, board, on_update=None):
+        """Gets the best move for a board. Its move stack goes to the engine too, which keeps the hash warm."""
+        try:
+            info = analyse(self.engine, board, self.stop_conditions, 3, on_update, self.cache, lookup=self.lookup)
+            return self.format_analysis(info, board)
         except Exception as e:
             logging.error(f"Engine analysis failed: {e}")
             return "Analysis Error", ""
 
+    def start_analysis_worker(self, on_result, on_update=None):
+        """Starts a background worker that analyses submitted boards, newest first."""
+        from pipeline import AnalysisWorker
+        worker = AnalysisWorker(self.engine, self.stop_conditions, on_result, on_update, cache=self.cache,
+                                ponder_stop=self.ponder_stop, ponder_replies=PONDER_REPLIES, lookup=self.lookup)
+        worker.start()
+        return worker
+
     def shutdown(self):
         """Closes the Stockfish engine process."""
+        self.wait_ready()
+        if self.cache:
+            self.cache.close()
+        if self.lookup:
+            self.lookup.close()
         if self.engine:
             self.engine.quit()
             logging.info("Stockfish engine closed.")
\ No newline at end of file
@@ -0,0 +1,120 @@
+# engine_pool.py
+
+import os
+import queue
+import threading
+import logging
+import chess.engine
+from analysis import analyse
+
+class EnginePool:
+    """Several UCI engine processes analysing a stream of positions in parallel.
+
+    Every process is driven by its own thread, which takes the next position
+    from a shared queue as soon as it is free. A deep position therefore only
+    ties up one process while the others keep draining the queue, and results
+    are put back into input order before they are yielded.
+    """
+
+    def __init__(self, command, processes=None, threads=1, hash_mb=64):
+        self.command = command
+        self.size = processes or os.cpu_count() or 1
+        self.options = {"Threads": threads, "Hash": hash_mb}
+        self.engines = []
+
+    def start(self):
+        """Launches the engine processes. Returns False if any of them fails."""
+        try:
+            for _ in range(self.size):
+                engine = chess.engine.SimpleEngine.popen_uci(self.command)
+                self.engines.append(engine)
+                engine.configure({name: value for name, value in self.options.items()
+                                  if value is not None and name in engine.options})
+            logging.info(f"Engine pool started with {len(self.engines)} processes.")
+            return True
+        except Exception as e:
+            logging.error(f"Failed to start engine pool: {e}")
+            self.close()
+            return False
+
+    def analyse_all(self, boards, stop, multipv=1, cache=None):
+        """Yields (board, info) for every board in `boards`, in input order.
+
+        `boards` may be any iterable, including a lazy one; it is read only a
+        few positions ahead of the slowest unfinished search. info is None
+        for a position whose analysis failed.
+        """
+        jobs = queue.Queue(maxsize=2 * len(self.engines))
+        results = queue.Queue()
+        closed = threading.Event()
+
+        def put(job):
+            while not closed.is_set():
+                try:
+                    jobs.put(job, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def feed():
+            try:
+                for index, board in enumerate(boards):
+                    if not put((index, board.copy())):
+                        return
+            except Exception as e:
+                logging.error(f"Failed to read positions: {e}")
+            finally:
+                for _ in self.engines:
+                    put(None)
+
+        def work(engine):
+            while not closed.is_set():
+                job = jobs.get()
+                if job is None:
+                    break
+                index, board = job
+                try:
+                    info = analyse(engine, board, stop, multipv, cache=cache)
+                except Exception as e:
+                    logging.error(f"Engine analysis failed for {board.fen()}: {e}")
+                    info = None
+                results.put((index, board, info))
+            results.put(None)
+
+        workers = [threading.Thread(target=feed, name="engine-pool-feed", daemon=True)]
+        workers += [threading.Thread(target=work, args=(engine,), name=f"engine-pool-{i}", daemon=True)
+                    for i, engine in enumerate(self.engines)]
+        for worker in workers:
+            worker.start()
+
+        pending = {}
+        next_index = 0
+        running = len(self.engines)
+        try:
+            while running:
+                item = results.get()
+                if item is None:
+                    running -= 1
+                    continue
+                pending[item[0]] = item[1:]
+                while next_index in pending:
+                    yield pending.pop(next_index)
+                    next_index += 1
+        finally:
+            closed.set()
+            # Wake any worker still waiting for a job so it can exit.
+            for _ in self.engines:
+                try:
+                    jobs.put_nowait(None)
+                except queue.Full:
+                    break
+
+    def close(self):
+        """Quits every engine process."""
+        for engine in self.engines:
+            try:
+                engine.quit()
+            except Exception as e:
+                logging.error(f"Failed to close engine: {e}")
+        self.engines = []
@@ -1,7 +1,7 @@
 import cv2
 import numpy as np
-import pyautogui
 import os
+from capture import MssCapture
 
 # =============================
 # CONFIG
@@ -24,9 +24,11 @@ MATCH_THRESHOLD = 0.55
 
 def capture_board():
     """Capture board screenshot and return image."""
-    screenshot = pyautogui.screenshot(region=(ROI_X, ROI_Y, ROI_W, ROI_H))
-    img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-    return img
+    capture = MssCapture()
+    try:
+        return np.ascontiguousarray(capture.grab((ROI_X, ROI_Y, ROI_W, ROI_H)))
+    finally:
+        capture.close()
 
 
 def split_squares(board_img):
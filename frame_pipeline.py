@@ -0,0 +1,234 @@
+# frame_pipeline.py
+
+import time
+import queue
+import logging
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+class FrameRing:
+    """Fixed-size BGR frames in a shared-memory ring, each slot stamped with its frame's sequence number.
+
+    The process that creates the ring writes to it; others attach by name
+    and read frames as NumPy views straight out of the shared block. A slot's
+    stamp is cleared while it is being overwritten and set again afterwards,
+    so a reader can tell whether the frame it looked at is still the one it
+    was told about (see valid()).
+    """
+
+    def __init__(self, shape, slots=8, name=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.owner = name is None
+        header = 8 * (slots + 1)
+        size = header + slots * int(np.prod(self.shape))
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        # [latest sequence number, stamp of slot 0, stamp of slot 1, ...]
+        self._stamps = np.ndarray((slots + 1,), dtype=np.int64, buffer=self.shm.buf)
+        self._frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=header)
+        if self.owner:
+            self._stamps[:] = -1
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, frame):
+        """Copies a frame into the next slot and returns its sequence number."""
+        seq = int(self._stamps[0]) + 1
+        slot = 1 + seq % self.slots
+        self._stamps[slot] = -1
+        self._frames[slot - 1] = frame
+        self._stamps[slot] = seq
+        self._stamps[0] = seq
+        return seq
+
+    def view(self, seq):
+        """The frame with this sequence number as a zero-copy view, or None if it has been overwritten."""
+        if not self.valid(seq):
+            return None
+        return self._frames[seq % self.slots]
+
+    def valid(self, seq):
+        """True while the slot still holds frame `seq`. Check again after reading a view."""
+        return int(self._stamps[1 + seq % self.slots]) == seq
+
+    def close(self):
+        """Detaches from the ring; the creating process also frees it. Drop every view first."""
+        self._stamps = self._frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+def _capture_main(ring_name, shape, slots, region, backend, replay_path, frames, stop, recheck, pending, timing):
+    """Capture process: polls the region and publishes every changed and settled frame to the ring.
+
+    Each published sequence number goes out with the squares the caller last
+    asked to have reclassified (see FramePipeline.recheck), which are then cleared.
+    """
+    from capture import create_capture
+    from scheduler import CaptureScheduler
+
+    poll_interval, debounce, idle_after, max_interval = timing
+    ring = FrameRing(shape, slots, ring_name)
+    capture = create_capture(backend, replay_path)
+    scheduler = CaptureScheduler(None, poll_interval, debounce, idle_after, max_interval)
+    warned = False
+    try:
+        while not stop.is_set():
+            frame = capture.grab(region)
+            now = time.monotonic()
+            if frame is not None and frame.shape != ring.shape:
+                if not warned:
+                    # A DPI change or a region clipped by the screen edge; the ring's slots cannot hold it.
+                    logging.warning(f"Captured frames are {frame.shape[1]}x{frame.shape[0]}, but the pipeline was "
+                                    f"started for {shape[1]}x{shape[0]}; no frames are published until they match. "
+                                    f"Restart and select the board region again.")
+                    warned = True
+                frame = None
+            elif frame is not None:
+                warned = False
+            with recheck.get_lock():
+                delay, recheck.value = recheck.value, -1.0
+            if delay >= 0:
+                scheduler.recheck(delay)
+            if frame is not None and scheduler.update(frame, now):
+                with pending.get_lock():
+                    squares = tuple(i for i, flag in enumerate(pending) if flag)
+                    pending[:] = bytes(64)
+                frames.put((ring.write(frame), squares))
+            stop.wait(scheduler.interval(now))
+    finally:
+        capture.close()
+        ring.close()
+
+def _recognize_main(ring_name, shape, slots, is_flipped, frames, results):
+    """Recognition process: turns published frames into (seq, placement, per-square confidence margins).
+
+    The squares sent with a frame are reclassified even if unchanged, so the
+    stabilizer's repeated readings of them are independent.
+    """
+    import chess
+    from recognition import BoardRecognizer
+
+    ring = FrameRing(shape, slots, ring_name)
+    recognizer = BoardRecognizer(open_capture=False)
+    # Parallelism comes from the processes here, not from threads inside each one.
+    recognizer.classifier.pool = None
+    try:
+        if not recognizer.load_templates():
+            return
+        while True:
+            job = frames.get()
+            if job is None:
+                return
+            seq, recheck = job
+            board_img = ring.view(seq)
+            if board_img is None:
+                continue
+            placement = recognizer.image_to_fen_pieces(is_flipped, board_img, recheck)
+            if not recognizer.cascade.calibrated and placement == chess.STARTING_BOARD_FEN:
+                # Calibrate while the view is still valid, then check it below like any other read.
+                recognizer.calibrate(is_flipped, board_img)
+            confidence = recognizer.last_confidence.astype(np.float32)
+            board_img = None
+            if ring.valid(seq):
+                results.put((seq, placement, confidence))
+            else:
+                # The capture process lapped us mid-read; a newer frame is queued anyway.
+                logging.debug(f"Frame {seq} was overwritten while it was being recognized.")
+    finally:
+        recognizer.close()
+        ring.close()
+
+class FramePipeline:
+    """Capture, recognition and analysis in separate processes around a shared-memory frame ring.
+
+    One capture process polls the board region and writes each changed and
+    settled frame into a FrameRing. Only its sequence number goes on a
+    queue. Recognition processes read the frame in place and send back just
+    the piece placement and the 64 per-square confidences. The calling
+    process (where the engine is driven) reads those with next_result().
+    Results arrive in sequence order, and ones overtaken by a newer frame
+    are dropped.
+    """
+
+    def __init__(self, region, is_flipped=False, workers=2, slots=8, backend="mss", replay_path=None,
+                 timing=(0.05, 0.15, 30.0, 1.5)):
+        self.region = tuple(int(v) for v in region)
+        self.is_flipped = is_flipped
+        self.workers = workers
+        self.slots = slots
+        self.backend = backend
+        self.replay_path = replay_path
+        self.timing = timing
+        self.ring = None
+        self.last_seq = -1
+        self._processes = []
+        # Spawned children work the same on every platform, and none of them inherits the GUI.
+        self._context = mp.get_context("spawn")
+
+    def start(self):
+        """Creates the ring and starts the capture and recognition processes."""
+        ctx = self._context
+        shape = (self.region[3], self.region[2], 3)
+        self.ring = FrameRing(shape, self.slots)
+        self._frames, self._results = ctx.Queue(), ctx.Queue()
+        # Seconds until the capture process should publish a frame regardless; negative when not asked.
+        self._stop, self._recheck = ctx.Event(), ctx.Value('d', -1.0)
+        # One flag per square (placement order) to reclassify in the next published frame.
+        self._pending = ctx.Array('b', 64)
+        common = (self.ring.name, shape, self.slots)
+        self._processes.append(ctx.Process(
+            target=_capture_main, name="capture", daemon=True,
+            args=common + (self.region, self.backend, self.replay_path, self._frames, self._stop, self._recheck,
+                           self._pending, self.timing)))
+        for i in range(self.workers):
+            self._processes.append(ctx.Process(
+                target=_recognize_main, name=f"recognize-{i}", daemon=True,
+                args=common + (self.is_flipped, self._frames, self._results)))
+        for process in self._processes:
+            process.start()
+        logging.info(f"Frame pipeline started: 1 capture and {self.workers} recognition processes, "
+                     f"{self.slots} x {shape[1]}x{shape[0]} frame ring.")
+
+    def next_result(self, timeout=None):
+        """Blocks for the next (seq, placement, confidence) newer than the last one returned, or None on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            try:
+                seq, placement, confidence = self._results.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            if seq > self.last_seq:
+                self.last_seq = seq
+                return seq, placement, confidence
+
+    def recheck(self, delay, squares=()):
+        """Asks the capture process to publish a frame after `delay` seconds even if nothing changes.
+
+        `squares` (placement order, a8 first) are reclassified in that frame
+        rather than reusing their labels from the worker's previous frame.
+        """
+        with self._pending.get_lock():
+            for i in squares:
+                self._pending[i] = 1
+        with self._recheck.get_lock():
+            self._recheck.value = delay
+
+    def close(self):
+        """Stops every process and frees the ring."""
+        if self.ring is None:
+            return
+        self._stop.set()
+        for _ in range(self.workers):
+            self._frames.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self.ring.close()
+        self.ring = None
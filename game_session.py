@@ -0,0 +1,93 @@
+# game_session.py
+
+import logging
+import chess
+from metrics import METRICS
+from move_inference import find_move_sequence
+
+def board_from_placement(placement, turn=chess.WHITE):
+    """A board for a bare piece placement, without inventing history.
+
+    Castling is allowed for every king and rook still on its home square,
+    rather than a blanket KQkq, and there is no en passant square. The
+    initial placement with White to move is the standard starting board,
+    so games followed from it are sent to engines as "startpos moves ...".
+    """
+    if placement == chess.STARTING_BOARD_FEN and turn == chess.WHITE:
+        return chess.Board()
+    board = chess.Board(None)
+    board.set_board_fen(placement)
+    board.turn = turn
+    board.castling_rights = chess.BB_CORNERS
+    board.castling_rights = board.clean_castling_rights()
+    return board
+
+class GameSession:
+    """Follows a game through recognized placements, keeping its real move history.
+
+    Every new placement is reached by pushing the inferred moves onto one
+    board. Castling rights, the en passant square, the move counters and
+    repetitions are therefore the game's own. python-chess sends engines
+    the whole move stack ("position startpos moves ..."), so each search
+    picks up the transposition table the previous one left. Only when the
+    moves cannot be followed does the session restart from the placement,
+    and the history is lost at that point.
+    """
+
+    def __init__(self):
+        self.board = None
+        self.turn_guessed = False
+
+    def reset(self, placement, turn=None):
+        """Restarts the game from a placement. Returns False if that is not a legal position.
+
+        With turn None the side to move is guessed: the other side from the
+        one before, or White, whichever gives a legal position. A guess is
+        corrected by the first move that only the other side could have made.
+        """
+        guessed = turn is None
+        if guessed:
+            turn = chess.WHITE if self.board is None else not self.board.turn
+        try:
+            board = board_from_placement(placement, turn)
+        except ValueError:
+            return False
+        if guessed and not board.is_valid():
+            board.turn = not board.turn
+        if not board.is_valid():
+            return False
+        self.board = board
+        self.turn_guessed = guessed
+        return True
+
+    def follow(self, placement, max_plies=3):
+        """Pushes the moves that lead to the placement and returns them.
+
+        Returns [] if the placement has not changed. Returns None, leaving
+        the board as it was, if no legal sequence of up to max_plies moves
+        reaches it.
+        """
+        if self.board is None:
+            return None
+        moves = find_move_sequence(self.board, placement, max_plies)
+        if moves is None and self.turn_guessed:
+            other = self.board.copy()
+            other.turn = not other.turn
+            moves = find_move_sequence(other, placement, max_plies) if other.is_valid() else None
+            if moves:
+                self.board = other
+        if moves:
+            for move in moves:
+                self.board.push(move)
+            self.turn_guessed = False
+        return moves
+
+    def update(self, placement, max_plies=3):
+        """follow(), or reset() with a guessed side to move if that fails. Returns True if the board changed."""
+        moves = self.follow(placement, max_plies)
+        if moves is not None:
+            return bool(moves)
+        if self.board is not None:
+            logging.info("Could not follow the moves; re-synchronizing.")
+            METRICS.incr("resyncs")
+        return self.reset(placement)
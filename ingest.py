@@ -0,0 +1,225 @@
+# ingest.py - reconstructs a game as PGN from a screen recording or a folder of screenshots.
+#
+#   python ingest.py recording.mp4 -o game.pgn --processes 4
+#   python ingest.py debug/ -o game.pgn --no-engine
+#
+# Every stage is a generator, so frames are decoded, filtered, recognized,
+# turned into moves and analysed one at a time and memory stays flat however
+# long the recording is. Only frames on which the board has changed and then
+# settled are recognized; the moves between them are found with the same
+# bitboard search the live assistant uses.
+
+import argparse
+import logging
+import os
+import sys
+import cv2
+import numpy as np
+import chess
+import chess.pgn
+
+from config import (PIECE_THEME, CONFIDENCE_THRESHOLD, STOCKFISH_PATH, ENGINE_POOL_SIZE, ENGINE_THREADS,
+                    ENGINE_HASH_MB, SQUARE_CHANGE_THRESHOLD, ANALYSIS_MIN_DEPTH, ANALYSIS_STABLE_ITERATIONS,
+                    ANALYSIS_STABLE_MARGIN)
+from capture import IMAGE_EXTENSIONS
+from board_locator import BoardLocator
+from template_store import TemplateStore
+from batch_classifier import BatchClassifier, split_squares, labels_to_fen
+from cascade_classifier import CascadeClassifier
+from move_inference import find_move_sequence
+from synthetic_board import load_theme
+from analysis import StopConditions
+from engine_pool import EnginePool
+from annotate import format_eval
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+START_PLACEMENT = chess.STARTING_BOARD_FEN
+# Smaller boards (under 8 px a square) cannot be recognized.
+MIN_BOARD_SIZE = 64
+
+def read_frames(source, every=1):
+    """Yields (seconds, BGR frame) from a video file or, in name order, a folder of images.
+
+    With every > 1 only every n-th video frame is decoded; the others are
+    skipped with grab(), which does not convert them to pixels.
+    """
+    if os.path.isdir(source):
+        names = sorted(f for f in os.listdir(source) if f.lower().endswith(IMAGE_EXTENSIONS))
+        for i, name in enumerate(names):
+            frame = cv2.imread(os.path.join(source, name), cv2.IMREAD_COLOR)
+            if frame is None:
+                logging.warning(f"Could not load frame: {name}")
+                continue
+            yield float(i), frame
+        return
+
+    video = cv2.VideoCapture(source)
+    if not video.isOpened():
+        raise ValueError(f"Could not open video '{source}'.")
+    try:
+        index = 0
+        while video.grab():
+            if index % every == 0:
+                ok, frame = video.retrieve()
+                if not ok:
+                    break
+                yield video.get(cv2.CAP_PROP_POS_MSEC) / 1000.0, frame
+            index += 1
+    finally:
+        video.release()
+
+def crop_boards(frames, locator, region=None):
+    """Crops the board out of every frame; frames without a usable board are dropped.
+
+    A fixed region (x, y, w, h) skips detection. Otherwise the located
+    rectangle is reused while its border still matches, and a frame in which
+    nothing is found is taken to be the board itself.
+    """
+    for t, frame in frames:
+        rect = region or locator.locate(frame)
+        if rect is None or min(rect[2], rect[3]) < MIN_BOARD_SIZE:
+            h, w = frame.shape[:2]
+            if region is None and min(h, w) >= MIN_BOARD_SIZE and abs(h - w) <= 8:
+                yield t, frame
+            continue
+        x, y, w, h = rect
+        yield t, frame[y:y+h, x:x+w]
+
+def _square_means(board_img):
+    """8x8 mean grey level of each square's block, cheap enough to run on every frame."""
+    gray = cv2.cvtColor(board_img, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, (64, 64), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+def keyframes(boards, change_threshold=SQUARE_CHANGE_THRESHOLD, settle=True):
+    """Yields only the boards that differ from the last one yielded.
+
+    Two boards differ if any square's 8x8 thumbnail moved by more than
+    change_threshold grey levels on average. With settle, a changed board is
+    only yielded once it also matches the frame before it, so piece
+    animations and half-drawn frames are never recognized.
+    """
+    last_key = None
+    previous = None
+    for t, board_img in boards:
+        thumb = _square_means(board_img)
+        still = previous is not None and _max_square_diff(thumb, previous) <= change_threshold
+        previous = thumb
+        if settle and not still:
+            continue
+        if last_key is not None and _max_square_diff(thumb, last_key) <= change_threshold:
+            continue
+        last_key = thumb
+        yield t, board_img
+
+def _max_square_diff(a, b):
+    return float(np.abs(a - b).reshape(8, 8, 8, 8).mean(axis=(1, 3)).max())
+
+def recognize(boards, cascade, threshold=CONFIDENCE_THRESHOLD, is_flipped=None):
+    """Yields (seconds, piece placement) for each keyframe.
+
+    If is_flipped is None the orientation is taken from the first board that
+    shows the starting position; until then White is assumed at the bottom.
+    A starting position also calibrates the cascade's fast path.
+    """
+    for t, board_img in boards:
+        squares = split_squares(board_img)
+        labels, _ = cascade.classify(squares, threshold)
+        placement = labels_to_fen(labels, bool(is_flipped))
+        if not cascade.calibrated:
+            for flipped in ((False, True) if is_flipped is None else (is_flipped,)):
+                if labels_to_fen(labels, flipped) == START_PLACEMENT and cascade.calibrate(squares, flipped):
+                    is_flipped = flipped
+                    placement = START_PLACEMENT
+                    break
+        yield t, placement
+
+def infer_moves(placements, board, max_plies=3):
+    """Yields a copy of the board after every move inferred between consecutive placements.
+
+    Placements that no legal sequence of up to max_plies moves reaches (a
+    misread, or a board that is not in play) are skipped.
+    """
+    skipped = 0
+    for t, placement in placements:
+        moves = find_move_sequence(board, placement, max_plies)
+        if not moves:
+            if moves is None:
+                skipped += 1
+                logging.debug(f"No legal move sequence reaches {placement} at {t:.1f}s; frame skipped.")
+            continue
+        for move in moves:
+            board.push(move)
+            yield board.copy()
+    if skipped:
+        logging.info(f"Skipped {skipped} keyframes that did not follow from the game so far.")
+
+def build_game(start, positions, pool=None, stop=None):
+    """Builds the PGN game, with an [%eval] comment per move if a pool is given."""
+    game = chess.pgn.Game()
+    if start.fen() != chess.STARTING_FEN:
+        game.setup(start)
+    game.headers["Annotator"] = "ingest.py"
+    results = pool.analyse_all(positions, stop) if pool else ((board, None) for board in positions)
+    node = game
+    for board, info in results:
+        node = node.add_variation(board.peek())
+        if info and 'score' in info[0]:
+            node.comment = f"[%eval {format_eval(info[0]['score'])}]"
+        logging.debug(f"{len(board.move_stack)}. {node.san()}")
+    return game
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruct a game as PGN from a video or a folder of screenshots.")
+    parser.add_argument("source", help="video file, or a folder of board screenshots")
+    parser.add_argument("-o", "--output", help="PGN file to write (default: stdout)")
+    parser.add_argument("--theme", default=PIECE_THEME, help="folder of 12 transparent piece PNGs")
+    parser.add_argument("--region", type=int, nargs=4, metavar=("X", "Y", "W", "H"), help="board rectangle in the frame")
+    parser.add_argument("--every", type=int, default=1, help="decode only every n-th video frame")
+    parser.add_argument("--flipped", action="store_true", help="Black is at the bottom (default: detect)")
+    parser.add_argument("--fen", help="starting position, if the recording does not start from the initial one")
+    parser.add_argument("--no-engine", action="store_true", help="skip the per-move evaluation")
+    parser.add_argument("--engine", nargs="+", default=[STOCKFISH_PATH], help="UCI engine command")
+    parser.add_argument("--processes", type=int, default=ENGINE_POOL_SIZE, help="engine processes (default: one per core)")
+    parser.add_argument("--think-time", type=float, default=0.3, help="time cap per position in seconds")
+    parser.add_argument("--depth", type=int, default=16, help="depth cap per position")
+    args = parser.parse_args()
+
+    store = TemplateStore()
+    for code, img in load_theme(args.theme).items():
+        store.add(code, img[:, :, :3], img[:, :, 3])
+    if len(store) < 12:
+        logging.error(f"Failed to load all 12 templates from '{args.theme}'.")
+        sys.exit(1)
+    cascade = CascadeClassifier(BatchClassifier(store))
+    start = chess.Board(args.fen) if args.fen else chess.Board()
+
+    pool = stop = None
+    if not args.no_engine:
+        stop = StopConditions(max_time=args.think_time, max_depth=args.depth,
+                              stable_iterations=ANALYSIS_STABLE_ITERATIONS, stable_margin=ANALYSIS_STABLE_MARGIN,
+                              min_depth=ANALYSIS_MIN_DEPTH)
+        pool = EnginePool(args.engine, args.processes, ENGINE_THREADS, ENGINE_HASH_MB)
+        if not pool.start():
+            sys.exit(1)
+
+    frames = read_frames(args.source, args.every)
+    boards = crop_boards(frames, BoardLocator(), tuple(args.region) if args.region else None)
+    keys = keyframes(boards, settle=not os.path.isdir(args.source))
+    placements = recognize(keys, cascade, is_flipped=True if args.flipped else None)
+    positions = infer_moves(placements, start.copy())
+    try:
+        game = build_game(start, positions, pool, stop)
+    finally:
+        if pool:
+            pool.close()
+
+    logging.info(f"Reconstructed {len(list(game.mainline_moves()))} plies.")
+    if args.output:
+        with open(args.output, "w") as f:
+            print(game, file=f)
+    else:
+        print(game)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# lookup.py
+
+import logging
+import chess
+import chess.polyglot
+import chess.syzygy
+from metrics import METRICS
+
+class Lookup:
+    """Answers positions from an opening book or endgame tablebases before the engine is asked.
+
+    The polyglot book is memory-mapped and Syzygy tables are opened on first
+    probe, so a hit costs microseconds. Answers use the engine's multipv
+    format, with `source` ("book" or "syzygy") and a human-readable `label`
+    instead of a score.
+    """
+
+    def __init__(self, book_path=None, syzygy_path=None):
+        self.book = None
+        self.tablebase = None
+        self.max_pieces = 0
+        if book_path:
+            try:
+                self.book = chess.polyglot.open_reader(book_path)
+                logging.info(f"Opening book loaded: {book_path}")
+            except Exception as e:
+                logging.error(f"Could not open opening book '{book_path}': {e}")
+        if syzygy_path:
+            try:
+                self.tablebase = chess.syzygy.open_tablebase(syzygy_path)
+                # Table names are the pieces, e.g. "KRPvKR" for five.
+                self.max_pieces = max((len(name) - 1 for name in self.tablebase.wdl), default=0)
+                logging.info(f"Syzygy tables loaded for up to {self.max_pieces} pieces: {syzygy_path}")
+            except Exception as e:
+                logging.error(f"Could not open Syzygy tables '{syzygy_path}': {e}")
+
+    def probe(self, board, multipv=3):
+        """Returns up to multipv book or tablebase lines for the board, or None if neither knows it."""
+        info = self._probe_tablebase(board, multipv) or self._probe_book(board, multipv)
+        if info:
+            METRICS.incr(f"{info[0]['source']}_hits")
+        return info
+
+    def _probe_book(self, board, multipv):
+        if self.book is None:
+            return None
+        weights = {}
+        for entry in self.book.find_all(board):
+            weights[entry.move] = weights.get(entry.move, 0) + entry.weight
+        if not weights:
+            return None
+        total = sum(weights.values()) or 1
+        ranked = sorted(weights.items(), key=lambda item: item[1], reverse=True)[:multipv]
+        return [{"multipv": i, "pv": [move], "source": "book", "label": f"book {100 * weight / total:.0f}%"}
+                for i, (move, weight) in enumerate(ranked, 1)]
+
+    def _probe_tablebase(self, board, multipv):
+        if (self.tablebase is None or chess.popcount(board.occupied) > self.max_pieces
+                or board.castling_rights or board.is_game_over()):
+            return None
+        names = {2: "win", 1: "cursed win", 0: "draw", -1: "blessed loss", -2: "loss"}
+        ranked = []
+        try:
+            for move in board.legal_moves:
+                board.push(move)
+                try:
+                    if board.is_checkmate():
+                        wdl, dtz, label = 2, 0, "checkmate"
+                    else:
+                        wdl, dtz = -self.tablebase.probe_wdl(board), -self.tablebase.probe_dtz(board)
+                        label = names[wdl] + (f", DTZ {abs(dtz)}" if wdl else "")
+                finally:
+                    board.pop()
+                ranked.append((wdl, -dtz, move, label))
+        except (KeyError, chess.syzygy.MissingTableError):
+            return None
+        # Best result first; among wins the fastest conversion, among losses the longest defence.
+        ranked.sort(key=lambda item: item[:2], reverse=True)
+        return [{"multipv": i, "pv": [move], "source": "syzygy", "label": label}
+                for i, (_, _, move, label) in enumerate(ranked[:multipv], 1)]
+
+    def close(self):
+        if self.book is not None:
+            self.book.close()
+        if self.tablebase is not None:
+            self.tablebase.close()
@@ -1,12 +1,11 @@
 # main.py
-import time
+import argparse
 import logging
 import os
 
-from screen_capture import select_capture_region, capture_screen
-from board_recognition import image_to_fen
-from engine import init_stockfish, get_best_move, close_stockfish
-from config import CAPTURE_INTERVAL, DEBUG_MODE, DEBUG_DIR
+from metrics import PROFILE
+from config import (CAPTURE_INTERVAL, CAPTURE_POLL_INTERVAL, CAPTURE_DEBOUNCE, CAPTURE_IDLE_AFTER,
+                    DEBUG_MODE, DEBUG_DIR, STABILIZER_FRAMES, STABILIZER_MARGIN, STABILIZER_RECHECK)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -15,13 +14,26 @@ def main():
     """
     The main loop for the real-time chess assistant.
     """
+    parser = argparse.ArgumentParser(description="Real-time chess assistant.")
+    parser.add_argument("--profile-startup", action="store_true", help="log how long imports and start-up steps take")
+    args = parser.parse_args()
+
     # Create debug directory if it doesn't exist
     if DEBUG_MODE and not os.path.exists(DEBUG_DIR):
         os.makedirs(DEBUG_DIR)
         
     # --- Initialization ---
-    if not init_stockfish():
-        return # Exit if Stockfish can't be started
+    # The engine starts in the background while the region is being selected.
+    with PROFILE.step("import engine"):
+        from engine import Engine
+    engine = Engine()
+    engine.startup_in_background()
+    with PROFILE.step("import recognition"):
+        from screen_capture import select_capture_region, grab_screen
+        import board_recognition
+        from scheduler import CaptureScheduler
+        from stabilizer import PositionStabilizer
+        from game_session import GameSession
 
     print("-----------------------------------------")
     print("      Real-Time Chess Assistant")
@@ -31,24 +43,45 @@ def main():
     capture_region = select_capture_region()
     if not capture_region:
         print("No region selected. Exiting.")
+        engine.shutdown()
         return
 
     # Ask user if the board is flipped (playing as black)
     flip_input = input("Are you playing as Black? (Is the board flipped?) [y/N]: ").lower()
     is_flipped = flip_input == 'y'
 
+    if not engine.wait_ready():
+        return # Exit if Stockfish can't be started
+
     print("\nAssistant started. Watching the board...")
     
+    # Only frames where the board has changed and settled are recognized.
+    scheduler = CaptureScheduler(grab_screen, CAPTURE_POLL_INTERVAL, CAPTURE_DEBOUNCE,
+                                 CAPTURE_IDLE_AFTER, CAPTURE_INTERVAL)
+    # Positions are only analysed once every changed square has settled.
+    stabilizer = PositionStabilizer(STABILIZER_FRAMES, STABILIZER_MARGIN)
+    # Moves between positions are inferred, so the engine gets the game's real history.
+    session = GameSession()
     last_fen = None
 
     try:
         while True:
-            screenshot = capture_screen()
-            if screenshot is None:
-                time.sleep(CAPTURE_INTERVAL)
-                continue
-
-            current_fen = image_to_fen(screenshot, is_flipped)
+            screenshot = scheduler.wait()
+            current_fen = board_recognition.image_to_fen(screenshot, is_flipped)
+            if not current_fen:
+                # Board not found on a settled frame; look again later even if nothing moves.
+                scheduler.recheck(CAPTURE_INTERVAL)
+            else:
+                placement, rest = current_fen.split(' ', 1)
+                placement = stabilizer.update(placement, board_recognition.LAST_CONFIDENCE)
+                current_fen = f"{placement} {rest}" if placement else None
+                if stabilizer.pending:
+                    # Re-read the unsettled squares soon instead of waiting for the next change.
+                    scheduler.recheck(STABILIZER_RECHECK)
+            if last_fen is None and current_fen:
+                PROFILE.mark("first recognized frame")
+                if args.profile_startup:
+                    PROFILE.report()
             
             # Check if board state is valid and has changed
             if current_fen and current_fen != last_fen:
@@ -56,22 +89,24 @@ def main():
                 print(f"✅ Detected Position: {current_fen.split(' ')[0]}")
                 last_fen = current_fen
                 
-                best_move, evaluation = get_best_move(current_fen)
+                fen_pieces = current_fen.split(' ')[0]
+                session.update(fen_pieces)
+                if session.board is None or session.board.board_fen() != fen_pieces:
+                    print("Recognized position is not a legal board.")
+                    continue
+                best_move, evaluation = engine.analyse_board(session.board)
                 
                 if best_move and evaluation:
                     print(f"♟️ Best Move: {best_move}")
-                    print(f"📊 Evaluation: {evaluation}")
+                    print(f"📊 Top Moves: {evaluation}")
                 else:
                     print("Could not retrieve engine analysis.")
                 print("="*40)
 
-            # Wait before the next capture to avoid high CPU usage
-            time.sleep(CAPTURE_INTERVAL)
-
     except KeyboardInterrupt:
         print("\nProgram stopped by user.")
     finally:
-        close_stockfish()
+        engine.shutdown()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
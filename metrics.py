@@ -0,0 +1,215 @@
+# metrics.py
+
+import json
+import time
+import logging
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Upper bucket edges in milliseconds for the latency histograms.
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf"))
+
+class _NullTimer:
+    """Stands in for a timer while metrics are disabled, so hot paths pay almost nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_TIMER = _NullTimer()
+
+class _Timer:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+class Metrics:
+    """Per-stage latency windows and event counters for the live pipeline.
+
+    Disabled by default: timer() hands back a shared no-op and incr() and
+    observe() return immediately. start() enables collection and, if asked,
+    writes a JSON snapshot every `interval` seconds and serves a plain-text
+    summary on 127.0.0.1:port.
+    """
+
+    def __init__(self, window=1000):
+        self.enabled = False
+        self.window = window
+        self.counters = defaultdict(int)
+        self.samples = defaultdict(lambda: deque(maxlen=self.window))
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._reporter = None
+        self._server = None
+        self._snapshot_path = None
+
+    def timer(self, name):
+        """Context manager timing one pass through a stage."""
+        if not self.enabled:
+            return NULL_TIMER
+        return _Timer(self, name)
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.samples[name].append(seconds)
+
+    def incr(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] += amount
+
+    def snapshot(self):
+        """Counters plus count/mean/p50/p90/p99/max and a histogram per timed stage."""
+        with self._lock:
+            counters = dict(self.counters)
+            samples = {name: list(values) for name, values in self.samples.items()}
+        stages = {}
+        for name, values in samples.items():
+            if not values:
+                continue
+            ordered = sorted(v * 1000 for v in values)
+            pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+            histogram, i = [], 0
+            for edge in BUCKETS_MS:
+                count = 0
+                while i < len(ordered) and ordered[i] <= edge:
+                    count += 1
+                    i += 1
+                histogram.append(count)
+            stages[name] = {
+                "count": len(ordered),
+                "mean_ms": sum(ordered) / len(ordered),
+                "p50_ms": pick(0.5),
+                "p90_ms": pick(0.9),
+                "p99_ms": pick(0.99),
+                "max_ms": ordered[-1],
+                "histogram": dict(zip(("le_" + str(e) for e in BUCKETS_MS), histogram)),
+            }
+        return {"uptime_s": time.time() - self.started_at, "counters": counters, "stages": stages}
+
+    def render_text(self):
+        """The snapshot as aligned plain text, for the HTTP endpoint."""
+        snap = self.snapshot()
+        lines = [f"uptime_s {snap['uptime_s']:.0f}"]
+        lines += [f"counter {name} {value}" for name, value in sorted(snap["counters"].items())]
+        for name, stage in sorted(snap["stages"].items()):
+            lines.append(
+                f"stage {name:<14} count {stage['count']:>6}  p50 {stage['p50_ms']:8.2f} ms  "
+                f"p90 {stage['p90_ms']:8.2f} ms  p99 {stage['p99_ms']:8.2f} ms  max {stage['max_ms']:8.2f} ms"
+            )
+        return "\n".join(lines) + "\n"
+
+    def write_snapshot(self, path):
+        try:
+            with open(path, "w") as f:
+                json.dump(self.snapshot(), f, indent=2)
+        except OSError as e:
+            logging.error(f"Could not write metrics snapshot to '{path}': {e}")
+
+    def start(self, snapshot_path=None, interval=30.0, port=None):
+        """Enables collection and starts the optional snapshot writer and HTTP endpoint."""
+        self.enabled = True
+        self.started_at = time.time()
+        self._snapshot_path = snapshot_path
+        if snapshot_path:
+            def report():
+                while not self._stop.wait(interval):
+                    self.write_snapshot(snapshot_path)
+            self._reporter = threading.Thread(target=report, name="metrics-reporter", daemon=True)
+            self._reporter.start()
+        if port:
+            # Imported here: http.server pulls in email and socketserver, which start-up does not need.
+            from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+            metrics = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = metrics.render_text().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            try:
+                self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+                threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+                logging.info(f"Metrics available at http://127.0.0.1:{port}/")
+            except OSError as e:
+                logging.error(f"Could not start metrics endpoint on port {port}: {e}")
+                self._server = None
+
+    def stop(self):
+        """Stops the background threads and writes a final snapshot."""
+        if not self.enabled:
+            return
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+        if self._snapshot_path:
+            self.write_snapshot(self._snapshot_path)
+
+METRICS = Metrics()
+
+class StartupProfile:
+    """Wall-clock timeline of start-up steps (imports, template loading, engine launch, ...).
+
+    Steps are always recorded, since that costs two perf_counter() calls;
+    entry points call report() when run with --profile-startup. Steps may
+    run on several threads, so the report lists each with its offset from
+    launch as well as its duration.
+    """
+
+    def __init__(self):
+        self.launched = time.perf_counter()
+        self.steps = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def step(self, name):
+        """Times the enclosed block as one step."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, start, time.perf_counter())
+
+    def mark(self, name):
+        """Records a milestone such as the first recognized frame."""
+        now = time.perf_counter()
+        self._record(name, now, now)
+
+    def _record(self, name, start, end):
+        with self._lock:
+            self.steps.append((start - self.launched, end - start, name, threading.current_thread().name))
+
+    def report(self):
+        """Logs every step recorded so far, in order of start."""
+        with self._lock:
+            steps = sorted(self.steps)
+        lines = ["Start-up profile (offset from launch, duration, step, thread):"]
+        lines += [f"  {offset * 1000:8.1f} ms  {duration * 1000:8.1f} ms  {name:<24} {thread}"
+                  for offset, duration, name, thread in steps]
+        logging.info("\n".join(lines))
+
+# Created on first import, which entry points do before anything heavy, so it approximates launch.
+PROFILE = StartupProfile()
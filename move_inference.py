@@ -0,0 +1,57 @@
+# move_inference.py
+
+import chess
+
+PIECE_MASKS = ("pawns", "knights", "bishops", "rooks", "queens", "kings")
+
+def placement_diff(board, target):
+    """Bitboard of the squares whose content differs between two placements."""
+    diff = (board.occupied_co[chess.WHITE] ^ target.occupied_co[chess.WHITE]) | \
+           (board.occupied_co[chess.BLACK] ^ target.occupied_co[chess.BLACK])
+    for name in PIECE_MASKS:
+        diff |= getattr(board, name) ^ getattr(target, name)
+    return diff
+
+def _touched(move):
+    return chess.BB_SQUARES[move.from_square] | chess.BB_SQUARES[move.to_square]
+
+def _candidates(board, relevant):
+    """Legal moves that start or end on a relevant square, found from bitboards."""
+    from_mask = board.occupied_co[board.turn] & relevant
+    moves = list(board.generate_legal_moves(from_mask, chess.BB_ALL))
+    moves += board.generate_legal_moves(chess.BB_ALL & ~from_mask, relevant)
+    return moves
+
+def _search(board, target, plies, touched, path):
+    diff = placement_diff(board, target)
+    if diff == 0:
+        return list(path)
+    # One ply changes at most four squares (castling), so prune hopeless branches.
+    if plies == 0 or chess.popcount(diff) > 4 * plies:
+        return None
+    for move in _candidates(board, diff | touched):
+        board.push(move)
+        path.append(move)
+        found = _search(board, target, plies - 1, touched | _touched(move), path)
+        path.pop()
+        board.pop()
+        if found is not None:
+            return found
+    return None
+
+def find_move_sequence(board, fen_pieces, max_plies=3):
+    """Finds the shortest legal move sequence (up to max_plies) that turns the board into fen_pieces.
+
+    The board is left unchanged. Returns [] if the placement already matches
+    and None if no sequence within the bound reaches it.
+    """
+    try:
+        target = chess.BaseBoard(fen_pieces)
+    except ValueError:
+        return None
+    # Iterative deepening, so a single move is always preferred over a longer explanation.
+    for plies in range(1, max_plies + 1):
+        found = _search(board, target, plies, 0, [])
+        if found is not None:
+            return found
+    return None
@@ -0,0 +1,290 @@
+# multiboard.py - watches several boards on one screen, e.g. a tournament broadcast layout.
+#
+#   python multiboard.py
+#
+# Draw one rectangle per board in the selection window (ENTER after each,
+# ESC when done). The screen is grabbed once per tick and every board is a
+# view into that one frame; all boards share the piece templates and one
+# pool of engine processes.
+
+import time
+import threading
+import logging
+from collections import OrderedDict
+import cv2
+import numpy as np
+import chess
+
+from config import (CONFIDENCE_THRESHOLD, SQUARE_CHANGE_THRESHOLD, FULL_REFRESH_FRAMES, STOCKFISH_PATH,
+                    STOCKFISH_THINK_TIME, ANALYSIS_MAX_DEPTH, ANALYSIS_MIN_DEPTH, ANALYSIS_STABLE_ITERATIONS,
+                    ANALYSIS_STABLE_MARGIN, ANALYSIS_CACHE_PATH, ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_DEPTH,
+                    ENGINE_POOL_SIZE, ENGINE_THREADS, ENGINE_HASH_MB, OPENING_BOOK_PATH, SYZYGY_PATH,
+                    CAPTURE_POLL_INTERVAL, CAPTURE_DEBOUNCE, CAPTURE_INTERVAL, MULTIBOARD_MAX_WAIT, TIME_FORCED,
+                    TIME_FEW_MOVES, TIME_EXTEND, TIME_CLEAR_GAP, TIME_UNSTABLE_MARGIN)
+from metrics import METRICS
+from batch_classifier import BatchClassifier, IncrementalClassifier, split_squares, labels_to_fen
+from cascade_classifier import CascadeClassifier
+from game_session import GameSession
+from scheduler import CaptureScheduler
+from analysis import StopConditions, analyse
+from time_manager import TimeManager
+from analysis_cache import AnalysisCache
+from lookup import Lookup
+from engine_pool import EnginePool
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s -[%(levelname)s]- %(message)s')
+
+class BoardWatch:
+    """One monitored board: its screen region, its recognition state and the game on it."""
+
+    def __init__(self, name, region, classifier, is_flipped=False, debounce=0.15):
+        self.name = name
+        self.region = region
+        self.is_flipped = is_flipped
+        self.cascade = CascadeClassifier(classifier)
+        self.incremental = IncrementalClassifier(self.cascade, SQUARE_CHANGE_THRESHOLD, FULL_REFRESH_FRAMES)
+        self.changes = CaptureScheduler(debounce=debounce)
+        self.session = GameSession()
+        self.generation = 0
+
+    @property
+    def board(self):
+        return self.session.board
+
+    def recognize(self, view):
+        """Returns the piece placement shown in this board's view of the frame."""
+        squares = split_squares(view)
+        labels, _ = self.incremental.classify(squares, CONFIDENCE_THRESHOLD)
+        placement = labels_to_fen(labels, self.is_flipped)
+        if not self.cascade.calibrated and placement == chess.STARTING_BOARD_FEN:
+            # Boards seen in the initial position calibrate their fast path.
+            if self.cascade.calibrate(squares, self.is_flipped):
+                self.incremental.reset()
+        return placement
+
+    def follow(self, placement, max_plies=3):
+        """Brings the tracked game up to the placement. Returns True if there is a new position to analyse."""
+        if placement.count('K') != 1 or placement.count('k') != 1:
+            return False
+        if self.board is not None and placement == self.board.board_fen():
+            return False
+        return self.session.update(placement, max_plies)
+
+class FairDispatcher:
+    """Positions waiting for an engine, at most one per board.
+
+    The board that changed most recently is served first, since that is the
+    game someone is watching right now. A position that has waited longer
+    than max_wait seconds goes ahead of it, so busy boards cannot starve
+    quiet ones.
+    """
+
+    def __init__(self, max_wait=3.0):
+        self.max_wait = max_wait
+        self._pending = OrderedDict()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def submit(self, watch, board, generation):
+        """Queues a board's newest position, replacing any older one still waiting."""
+        with self._cond:
+            self._pending.pop(watch, None)
+            self._pending[watch] = (board.copy(), generation, time.monotonic())
+            self._cond.notify()
+
+    def take(self):
+        """Blocks for the next (watch, board, generation), or returns None once closed."""
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return None
+            oldest = next(iter(self._pending))
+            if time.monotonic() - self._pending[oldest][2] >= self.max_wait:
+                watch = oldest
+            else:
+                watch = next(reversed(self._pending))
+            board, generation, _ = self._pending.pop(watch)
+            return watch, board, generation
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+class MultiBoardMonitor:
+    """Recognizes several boards from one screen grab per tick and analyses them on a shared engine pool.
+
+    Every board keeps its own change detector, classifier state and game,
+    but they all share one template store and batch classifier, so an extra
+    board costs little more than recognizing it when it changes. A new
+    position on a board stops any search still running on its previous one.
+    """
+
+    def __init__(self, capture, templates, pool, stop, on_result, multipv=3, cache=None, lookup=None,
+                 max_wait=3.0, poll_interval=0.05, debounce=0.15):
+        self.capture = capture
+        self.classifier = BatchClassifier(templates)
+        self.pool = pool
+        self.stop = stop
+        self.on_result = on_result
+        self.multipv = multipv
+        self.cache = cache
+        self.lookup = lookup
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.watches = []
+        self.dispatcher = FairDispatcher(max_wait)
+        self._lock = threading.Lock()
+        self._running = {}
+        self._workers = []
+
+    def add_board(self, region, is_flipped=False, name=None):
+        """Registers a board region (x, y, w, h) in screen coordinates."""
+        watch = BoardWatch(name or f"Board {len(self.watches) + 1}", tuple(int(v) for v in region),
+                           self.classifier, is_flipped, self.debounce)
+        self.watches.append(watch)
+        # Keep pre-scaled templates for every board size at once.
+        store = self.classifier.store
+        store.max_sizes = max(store.max_sizes, len(self.watches))
+        return watch
+
+    def _bounds(self):
+        """The smallest rectangle containing every board, so one grab covers them all."""
+        x0 = min(w.region[0] for w in self.watches)
+        y0 = min(w.region[1] for w in self.watches)
+        x1 = max(w.region[0] + w.region[2] for w in self.watches)
+        y1 = max(w.region[1] + w.region[3] for w in self.watches)
+        return x0, y0, x1 - x0, y1 - y0
+
+    def tick(self):
+        """Grabs the screen once and processes every board that has changed and settled."""
+        bounds = self._bounds()
+        with METRICS.timer("capture"):
+            frame = self.capture.grab(bounds)
+        if frame is None:
+            return
+        now = time.monotonic()
+        for watch in self.watches:
+            x, y, w, h = watch.region
+            view = frame[y - bounds[1]:y - bounds[1] + h, x - bounds[0]:x - bounds[0] + w]
+            if not watch.changes.update(view, now):
+                continue
+            with METRICS.timer("recognize"):
+                placement = watch.recognize(view)
+            METRICS.incr("frames")
+            if not watch.follow(placement):
+                watch.changes.recheck(CAPTURE_INTERVAL)
+                continue
+            with self._lock:
+                watch.generation += 1
+                running = self._running.get(watch)
+                if running is not None:
+                    running.stop()
+            self.dispatcher.submit(watch, watch.board, watch.generation)
+
+    def _work(self, engine):
+        while True:
+            job = self.dispatcher.take()
+            if job is None:
+                return
+            watch, board, generation = job
+            registered = None
+
+            def register(analysis):
+                nonlocal registered
+                with self._lock:
+                    registered = analysis
+                    self._running[watch] = analysis
+                    if generation != watch.generation:
+                        analysis.stop()
+            try:
+                info = analyse(engine, board, self.stop, self.multipv, None, self.cache, register, self.lookup)
+            except Exception as e:
+                logging.error(f"[{watch.name}] Engine analysis failed: {e}")
+                continue
+            finally:
+                with self._lock:
+                    # A newer search for this board may have registered since; leave it stoppable.
+                    if registered is not None and self._running.get(watch) is registered:
+                        del self._running[watch]
+            if generation == watch.generation:
+                self.on_result(watch, board, info)
+
+    def start(self):
+        """Starts one dispatching thread per engine in the pool."""
+        for i, engine in enumerate(self.pool.engines):
+            worker = threading.Thread(target=self._work, args=(engine,), name=f"multiboard-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def run(self):
+        """Ticks until interrupted."""
+        self.start()
+        while True:
+            self.tick()
+            time.sleep(self.poll_interval)
+
+    def close(self):
+        """Stops the workers and any search still running."""
+        self.dispatcher.close()
+        with self._lock:
+            for analysis in self._running.values():
+                analysis.stop()
+        for worker in self._workers:
+            worker.join()
+
+def main():
+    """Lets the user mark several boards, then analyses whichever of them changes."""
+    from recognition import BoardRecognizer
+    from engine import Engine
+
+    recognizer = BoardRecognizer()
+    if not recognizer.load_templates(): return
+
+    logging.info("A window will appear. Draw a TIGHT rectangle on each board, pressing ENTER after each, then ESC.")
+    img = np.ascontiguousarray(recognizer.capture.grab())
+    regions = cv2.selectROIs("Select Chessboards", img, fromCenter=False, showCrosshair=True)
+    cv2.destroyAllWindows()
+    if len(regions) == 0:
+        logging.error("No boards selected. Exiting.")
+        return
+    flipped = input(f"Which of the {len(regions)} boards have Black at the bottom? (e.g. 2,3; blank for none): ")
+    flipped = {int(n) for n in flipped.replace(" ", "").split(",") if n.isdigit()}
+
+    pool = EnginePool(STOCKFISH_PATH, ENGINE_POOL_SIZE, ENGINE_THREADS, ENGINE_HASH_MB)
+    if not pool.start(): return
+    cache = AnalysisCache(ANALYSIS_CACHE_PATH, ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_DEPTH)
+    lookup = Lookup(OPENING_BOOK_PATH, SYZYGY_PATH)
+    # Quiet or forced positions free their engine sooner for the other boards.
+    stop = TimeManager(StopConditions(max_time=STOCKFISH_THINK_TIME, max_depth=ANALYSIS_MAX_DEPTH,
+                                      stable_iterations=ANALYSIS_STABLE_ITERATIONS,
+                                      stable_margin=ANALYSIS_STABLE_MARGIN, min_depth=ANALYSIS_MIN_DEPTH),
+                       TIME_FORCED, TIME_FEW_MOVES, TIME_EXTEND, TIME_CLEAR_GAP, TIME_UNSTABLE_MARGIN)
+    format_analysis = Engine().format_analysis
+
+    def print_analysis(watch, board, info):
+        best_move, top_moves_str = format_analysis(info, board)
+        side = "White" if board.turn == chess.WHITE else "Black"
+        print(f"[{watch.name}] {side} to move. ♟️ Best Move: {best_move} | 📊 {top_moves_str}")
+
+    monitor = MultiBoardMonitor(recognizer.capture, recognizer.templates, pool, stop, print_analysis,
+                                cache=cache, lookup=lookup, max_wait=MULTIBOARD_MAX_WAIT,
+                                poll_interval=CAPTURE_POLL_INTERVAL, debounce=CAPTURE_DEBOUNCE)
+    for i, region in enumerate(regions, 1):
+        monitor.add_board(region, i in flipped)
+
+    print(f"\n✅ Watching {len(regions)} boards with {len(pool.engines)} engine processes...")
+    try:
+        monitor.run()
+    except KeyboardInterrupt:
+        print("\nProgram stopped by user.")
+    finally:
+        monitor.close()
+        pool.close()
+        cache.close()
+        lookup.close()
+        recognizer.capture.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# pipeline.py
+
+import queue
+import threading
+import logging
+import chess.polyglot
+from analysis import analyse
+from metrics import METRICS
+
+class AnalysisWorker(threading.Thread):
+    """Analyses the newest submitted position on a background thread.
+
+    The capture/recognition loop calls submit() and never waits for the
+    engine. Positions go through a queue of size one, so only the latest is
+    kept, and submitting while a search is running stops that search: its
+    result would describe a position that is no longer on the board.
+    Searches stream their progress to on_update and end at the first of
+    the `stop` conditions; `lookup` (book and tablebases) and `cache`, if
+    given, are consulted first.
+
+    While the opponent is thinking, ponder() spends the idle engine on our
+    answers to their `ponder_replies` likeliest moves and leaves them in the
+    cache, so a predicted reply is answered from it at once.
+    """
+
+    def __init__(self, engine, stop, on_result, on_update=None, multipv=3, cache=None,
+                 ponder_stop=None, ponder_replies=3, lookup=None):
+        super().__init__(name="analysis-worker", daemon=True)
+        self.engine = engine
+        self.stop = stop
+        self.cache = cache
+        self.lookup = lookup
+        self.ponder_stop = ponder_stop or stop
+        self.ponder_replies = ponder_replies
+        self.on_result = on_result
+        self.on_update = on_update
+        self.multipv = multipv
+        self.positions = queue.Queue(maxsize=1)
+        self.stale_count = 0
+        self._lock = threading.Lock()
+        self._current = None
+        self._generation = 0
+        self._pondered = set()
+
+    def _replace_pending(self, board, speculative=False, clock=None):
+        """Swaps the pending position for a new one and stops the current search. Caller holds the lock."""
+        try:
+            self.positions.get_nowait()
+        except queue.Empty:
+            pass
+        self._generation += 1
+        self.positions.put_nowait((self._generation, board, speculative, clock))
+        if self._current is not None:
+            self._current.stop()
+
+    def submit(self, board, clock=None):
+        """Queues a copy of the board for analysis, cancelling any in-flight search.
+
+        `clock` is the seconds left on the player's clock when the board was
+        read, if known; a time_manager.TimeManager `stop` budgets by it.
+        """
+        with self._lock:
+            if chess.polyglot.zobrist_hash(board) in self._pondered:
+                METRICS.incr("ponder_hits")
+                logging.debug("Opponent played a predicted reply; answering from the ponder results.")
+            self._pondered.clear()
+            self._replace_pending(board.copy(), clock=clock)
+
+    def ponder(self, board):
+        """Analyses our answers to the opponent's likeliest replies to `board` while they think.
+
+        Replaces any pending position like submit(), but nothing is reported:
+        the answers only go into the cache. Without a cache this just cancels.
+        """
+        if self.cache is None or self.ponder_replies < 1 or board.is_game_over():
+            self.cancel()
+            return
+        with self._lock:
+            self._replace_pending(board.copy(), speculative=True)
+
+    def cancel(self):
+        """Stops the in-flight search and drops any pending position."""
+        with self._lock:
+            try:
+                self.positions.get_nowait()
+            except queue.Empty:
+                pass
+            self._generation += 1
+            if self._current is not None:
+                self._current.stop()
+
+    def close(self):
+        """Stops the worker after cancelling the current search."""
+        with self._lock:
+            self._replace_pending(None)
+        self.join()
+
+    def _ponder(self, generation, board):
+        """Predicts the opponent's replies, then analyses our answer to each, best first."""
+        replies = analyse(self.engine, board, self.ponder_stop, self.ponder_replies, None,
+                          self.cache, self._registrar(generation), self.lookup)
+        for line in replies:
+            reply = line.get('pv', [None])[0]
+            if reply is None:
+                continue
+            answer = board.copy()
+            answer.push(reply)
+            if answer.is_game_over():
+                continue
+            with self._lock:
+                self._current = None
+                if generation != self._generation:
+                    return
+                self._pondered.add(chess.polyglot.zobrist_hash(answer))
+            analyse(self.engine, answer, self.stop, self.multipv, None, self.cache, self._registrar(generation),
+                    self.lookup)
+            METRICS.incr("ponder_searches")
+        with self._lock:
+            self._current = None
+
+    def _progress(self, generation):
+        """Wraps on_update so a superseded search stops reporting."""
+        if self.on_update is None:
+            return None
+        def report(board, info):
+            if generation == self._generation:
+                self.on_update(board, info)
+        return report
+
+    def _registrar(self, generation):
+        """Registers a running search so submit() and cancel() can stop it."""
+        def register(analysis):
+            with self._lock:
+                self._current = analysis
+                if generation != self._generation:
+                    analysis.stop()
+        return register
+
+    def run(self):
+        while True:
+            generation, board, speculative, clock = self.positions.get()
+            if board is None:
+                return
+            try:
+                with self._lock:
+                    if generation != self._generation:
+                        continue
+                if speculative:
+                    self._ponder(generation, board)
+                    continue
+                info = analyse(self.engine, board, self.stop, self.multipv, self._progress(generation),
+                               self.cache, self._registrar(generation), self.lookup, clock)
+                with self._lock:
+                    self._current = None
+                    stale = generation != self._generation
+                if stale:
+                    self.stale_count += 1
+                    logging.debug("Discarded analysis of a position that is no longer current.")
+                    continue
+                self.on_result(board, info)
+            except Exception as e:
+                with self._lock:
+                    self._current = None
+                logging.error(f"Engine analysis failed: {e}")
\ No newline at end of file
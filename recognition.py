@@ -1,20 +1,41 @@
 # recognition.py
 
-import pyautogui
 import cv2
 import numpy as np
 import os
 import logging
-from config import PIECE_THEME, CONFIDENCE_THRESHOLD
+from config import (PIECE_THEME, CONFIDENCE_THRESHOLD, TEMPLATE_CACHE_SIZE, SQUARE_CHANGE_THRESHOLD,
+                    FULL_REFRESH_FRAMES, CAPTURE_BACKEND, CAPTURE_REPLAY_PATH, RECOGNITION_WORKERS,
+                    RECOGNITION_BACKEND, RECOGNITION_MIN_WORK)
+from capture import create_capture
+from metrics import METRICS
+from template_store import TemplateStore
+from theme_pack import load_pack
+from classifier_pool import ClassifierPool
+from batch_classifier import (BatchClassifier, IncrementalClassifier, split_squares, labels_to_fen,
+                              confidence_margins)
+from cascade_classifier import CascadeClassifier
 
 class BoardRecognizer:
-    def __init__(self):
+    def __init__(self, open_capture=True):
         self.board_region = None
-        self.piece_templates = {}
-        self.template_masks = {}
+        # Recognition-only users (e.g. frame pipeline workers) are handed their frames.
+        self.capture = create_capture(CAPTURE_BACKEND, CAPTURE_REPLAY_PATH) if open_capture else None
+        self.templates = TemplateStore(TEMPLATE_CACHE_SIZE)
+        self.pool = ClassifierPool(RECOGNITION_WORKERS, RECOGNITION_BACKEND, RECOGNITION_MIN_WORK)
+        self.classifier = BatchClassifier(self.templates, self.pool)
+        self.cascade = CascadeClassifier(self.classifier)
+        self.incremental = IncrementalClassifier(self.cascade, SQUARE_CHANGE_THRESHOLD, FULL_REFRESH_FRAMES)
+        self.last_scores = None
+        self.last_confidence = None
 
     def load_templates(self):
-        """Loads piece templates and their transparency masks."""
+        """Loads piece templates and their transparency masks, from the compiled theme pack if there is one."""
+        pack = load_pack(PIECE_THEME)
+        if pack is not None and len(pack.codes) >= 12:
+            self.templates.load_pack(pack)
+            logging.info(f"Loaded {len(self.templates)} templates from the theme pack.")
+            return True
         logging.info(f"Loading piece templates from: {PIECE_THEME}")
         try:
             for filename in os.listdir(PIECE_THEME):
@@ -27,13 +48,12 @@ class BoardRecognizer:
                         logging.error(f"Template '{filename}' is not a valid PNG with transparency. Please recapture it.")
                         return False
                         
-                    self.template_masks[piece_code] = template_rgba[:, :, 3]
-                    self.piece_templates[piece_code] = template_rgba[:, :, :3]
+                    self.templates.add(piece_code, template_rgba[:, :, :3], template_rgba[:, :, 3])
 
-            if len(self.piece_templates) < 12:
+            if len(self.templates) < 12:
                 logging.error(f"Failed to load all 12 templates from '{PIECE_THEME}'.")
                 return False
-            logging.info(f"Successfully loaded {len(self.piece_templates)} templates with masks.")
+            logging.info(f"Successfully loaded {len(self.templates)} templates with masks.")
             return True
         except Exception as e:
             logging.error(f"Error loading templates from '{PIECE_THEME}': {e}")
@@ -43,8 +63,7 @@ class BoardRecognizer:
         """Lets the user select the board region."""
         logging.info("A window will appear. Draw a TIGHT rectangle on the 8x8 squares only, INSIDE the coordinates.")
         try:
-            screenshot = pyautogui.screenshot()
-            img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+            img = np.ascontiguousarray(self.capture.grab())
             roi = cv2.selectROI("Select Chessboard Region", img, fromCenter=False, showCrosshair=True)
             cv2.destroyAllWindows()
             if roi[2] == 0 or roi[3] == 0:
@@ -57,47 +76,49 @@ class BoardRecognizer:
             logging.error(f"Could not select region: {e}")
             return False
 
+    def calibrate(self, is_flipped=False, board_img=None):
+        """Calibrates the empty/colour fast path from a capture of the starting position, or from board_img."""
+        if board_img is None:
+            board_img = self.grab_board()
+        if board_img is None: return False
+        calibrated = self.cascade.calibrate(split_squares(board_img), is_flipped)
+        self.incremental.reset()
+        return calibrated
+
     def _identify_piece(self, square_img):
         """Identifies a piece using masked template matching."""
-        best_match_piece = None
-        max_score = CONFIDENCE_THRESHOLD
-        h, w, _ = square_img.shape
+        labels, _ = self.classifier.classify(square_img[np.newaxis], CONFIDENCE_THRESHOLD)
+        return labels[0]
+
+    def grab_board(self):
+        """Grabs the selected board region, or None before one is selected."""
+        if not self.board_region or self.capture is None: return None
+        return self.capture.grab(self.board_region)
+
+    def image_to_fen_pieces(self, is_flipped=False, board_img=None, recheck=()):
+        """Returns the piece placement part of the FEN, capturing the board unless board_img is given.
 
-        for piece_code, template in self.piece_templates.items():
-            resized_template = cv2.resize(template, (w, h), interpolation=cv2.INTER_AREA)
-            mask = self.template_masks[piece_code]
-            resized_mask = cv2.resize(mask, (w, h), interpolation=cv2.INTER_AREA)
-            res = cv2.matchTemplate(square_img, resized_template, cv2.TM_CCOEFF_NORMED, mask=resized_mask)
-            _, current_max, _, _ = cv2.minMaxLoc(res)
-            
-            if current_max > max_score:
-                max_score = current_max
-                best_match_piece = piece_code
-        return best_match_piece
+        Squares in `recheck` (placement order, a8 first) are reclassified even
+        if unchanged, so that repeated readings of them are independent.
+        last_confidence holds every square's confidence margin in the same order.
+        """
+        if board_img is None:
+            with METRICS.timer("capture"):
+                board_img = self.grab_board()
+        if board_img is None: return None
+        force = [63 - i for i in recheck] if is_flipped else recheck
+        with METRICS.timer("recognize"):
+            labels, self.last_scores = self.incremental.classify(split_squares(board_img), CONFIDENCE_THRESHOLD,
+                                                                 force)
+            fen = labels_to_fen(labels, is_flipped)
+        margins = confidence_margins(self.last_scores, CONFIDENCE_THRESHOLD)
+        self.last_confidence = margins[::-1] if is_flipped else margins
+        METRICS.incr("frames")
+        METRICS.incr("squares_reclassified", len(self.incremental.changed))
+        return fen
 
-    def image_to_fen_pieces(self, is_flipped=False):
-        """Captures the board and returns the piece placement part of the FEN."""
-        if not self.board_region: return None
-        screenshot = pyautogui.screenshot(region=self.board_region)
-        board_img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-        
-        square_h, square_w = board_img.shape[0] // 8, board_img.shape[1] // 8
-        fen_rows = []
-        for r in range(8):
-            fen_row = ""
-            empty_count = 0
-            for c in range(8):
-                square = board_img[r*square_h:(r+1)*square_h, c*square_w:(c+1)*square_w]
-                piece = self._identify_piece(square)
-                if piece:
-                    if empty_count > 0: fen_row += str(empty_count)
-                    empty_count = 0
-                    piece_char = piece[1]
-                    fen_row += piece_char.lower() if piece[0] == 'b' else piece_char.upper()
-                else:
-                    empty_count += 1
-            if empty_count > 0: fen_row += str(empty_count)
-            fen_rows.append(fen_row)
-        
-        fen = "/".join(fen_rows)
-        return '/'.join(row[::-1] for row in fen.split('/')[::-1]) if is_flipped else fen
\ No newline at end of file
+    def close(self):
+        """Releases the capture backend and the classification workers."""
+        if self.capture is not None:
+            self.capture.close()
+        self.pool.close()
\ No newline at end of file
@@ -0,0 +1,114 @@
+# scheduler.py
+
+import time
+import logging
+import cv2
+import numpy as np
+from metrics import METRICS
+
+def board_hash(board_img, size=64, margin=8):
+    """Perceptual hash of a board image: the signs of its horizontal gradients on a grey thumbnail.
+
+    The thumbnail is size x size (8x8 pixels a square for the default). A
+    gradient only sets a bit once it exceeds `margin` grey levels, so flat
+    squares hash to zeros instead of to noise.
+    """
+    thumb = cv2.resize(board_img, (size + 1, size), interpolation=cv2.INTER_AREA)
+    if thumb.ndim == 3:
+        thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+    steps = np.diff(thumb.astype(np.int16), axis=1)
+    return np.stack([steps > margin, steps < -margin])
+
+def hash_distance(a, b):
+    """Most bits differing within any one square between two board hashes.
+
+    Counting per square keeps a real move (many bits in one or two squares)
+    apart from noise (a stray bit here and there across the whole board).
+    """
+    side = a.shape[1] // 8
+    return int((a ^ b).reshape(2, 8, side, 8, side).sum(axis=(0, 2, 4)).max())
+
+class CaptureScheduler:
+    """Decides when a full capture and recognition is worth running.
+
+    wait() polls a thumbnail of the board region every poll_interval seconds
+    and returns a frame only once its hash has moved away from the last
+    returned one and then held still for `debounce` seconds, so frames of a
+    piece sliding across the board are never recognized. After idle_after
+    seconds without a change the polling interval doubles each idle_after
+    seconds, up to max_interval. Callers that poll frames themselves can
+    feed them to update() instead.
+    """
+
+    def __init__(self, grab=None, poll_interval=0.05, debounce=0.15, idle_after=30.0, max_interval=1.5,
+                 threshold=12):
+        self.grab = grab
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.idle_after = idle_after
+        self.max_interval = max_interval
+        self.threshold = threshold
+        self.reference = None
+        self.pending = None
+        self.pending_since = None
+        self.recheck_at = None
+        self.last_change = time.monotonic()
+
+    def reset(self):
+        """Makes the next wait() return the current frame straight away."""
+        self.reference = None
+        self.pending = None
+
+    def recheck(self, delay):
+        """Makes wait() return a frame after `delay` seconds even if nothing changes, e.g. after a misread."""
+        self.recheck_at = time.monotonic() + delay
+
+    def interval(self, now):
+        """Seconds until the next poll: short while active, backing off once idle."""
+        idle = now - self.last_change
+        if self.pending is not None or idle < self.idle_after:
+            interval = self.poll_interval
+        else:
+            interval = min(self.max_interval, self.poll_interval * 2 ** (idle / self.idle_after))
+        if self.recheck_at is not None:
+            interval = min(interval, max(self.recheck_at - now, 0.0))
+        return interval
+
+    def update(self, frame, now=None):
+        """Feeds one polled frame; returns True if it has changed and settled and should be recognized."""
+        now = time.monotonic() if now is None else now
+        current = board_hash(frame)
+        if self.reference is None:
+            self.reference = current
+            self.last_change = now
+            return True
+        if self.recheck_at is not None and now >= self.recheck_at and self.pending is None:
+            self.reference = current
+            self.recheck_at = None
+            return True
+        if hash_distance(current, self.reference) <= self.threshold:
+            # Back where it was (e.g. a premove shown and withdrawn).
+            self.pending = None
+        elif self.pending is None or hash_distance(current, self.pending) > self.threshold:
+            # Still moving: restart the debounce window.
+            self.pending = current
+            self.pending_since = now
+        elif now - self.pending_since >= self.debounce:
+            self.reference = current
+            self.pending = None
+            self.recheck_at = None
+            self.last_change = now
+            METRICS.incr("settled_changes")
+            return True
+        return False
+
+    def wait(self):
+        """Blocks until the board has changed and settled, then returns that frame."""
+        while True:
+            with METRICS.timer("poll"):
+                frame = self.grab()
+            now = time.monotonic()
+            if frame is not None and self.update(frame, now):
+                logging.debug("Board changed and settled; running recognition.")
+                return frame
+            time.sleep(self.interval(now))
@@ -1,13 +1,23 @@
-# screen_capture.py - NEW VERSION USING PILLOW
+# screen_capture.py - NEW VERSION USING A PERSISTENT CAPTURE BACKEND
 
 import cv2
 import numpy as np
-from PIL import ImageGrab
 import logging
+from capture import create_capture
+from metrics import METRICS
+from config import CAPTURE_BACKEND, CAPTURE_REPLAY_PATH
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 CAPTURE_BBOX = None
+_CAPTURE = None
+
+def _get_capture():
+    """Opens the capture backend once and reuses it for every grab."""
+    global _CAPTURE
+    if _CAPTURE is None:
+        _CAPTURE = create_capture(CAPTURE_BACKEND, CAPTURE_REPLAY_PATH)
+    return _CAPTURE
 
 def select_capture_region():
     """
@@ -17,9 +27,7 @@ def select_capture_region():
     global CAPTURE_BBOX
 
     # Grab the entire screen
-    screenshot = ImageGrab.grab()
-    screenshot_np = np.array(screenshot)
-    img = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
+    img = np.ascontiguousarray(_get_capture().grab())
 
     # Let the user select the ROI
     cv2.putText(img, "Draw a rectangle around the chessboard and press ENTER", 
@@ -29,27 +37,33 @@ def select_capture_region():
     cv2.destroyAllWindows()
 
     # roi = (x, y, w, h)
-    # We need (left, top, right, bottom) for Pillow
+    # Stored as (left, top, right, bottom)
     left, top, w, h = roi
     CAPTURE_BBOX = (left, top, left + w, top + h)
 
     logging.info(f"Capture region selected. Bounding box: {CAPTURE_BBOX}")
     return CAPTURE_BBOX
 
-def capture_screen():
+def grab_screen():
     """
-    Captures the pre-defined screen region using Pillow.
+    Grabs the pre-defined screen region without recording metrics. Used for
+    the change scheduler's polls, which it times itself as "poll".
     """
     if CAPTURE_BBOX is None:
         logging.error("Capture region is not set. Call select_capture_region() first.")
         return None
 
     try:
-        screenshot = ImageGrab.grab(bbox=CAPTURE_BBOX)
-        img = np.array(screenshot)
-        img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
-        logging.info("Screenshot captured successfully with Pillow.")
-        return img
+        left, top, right, bottom = CAPTURE_BBOX
+        return _get_capture().grab((left, top, right - left, bottom - top))
     except Exception as e:
-        logging.error(f"Failed to capture screen with Pillow: {e}")
-        return None
\ No newline at end of file
+        logging.error(f"Failed to capture screen: {e}")
+        return None
+
+def capture_screen():
+    """
+    Captures the pre-defined screen region. The returned BGR image is a view
+    into the backend's buffer rather than a copy.
+    """
+    with METRICS.timer("capture"):
+        return grab_screen()
@@ -0,0 +1,67 @@
+# stabilizer.py
+
+from collections import deque
+from metrics import METRICS
+
+def expand_placement(placement):
+    """The 64 squares of a FEN piece placement as characters, a8 first, '.' for empty; None if malformed."""
+    squares = []
+    for ch in placement.replace("/", ""):
+        squares.extend("." * int(ch) if ch.isdigit() else ch)
+    return squares if len(squares) == 64 else None
+
+class PositionStabilizer:
+    """Holds a recognized position back until every square that changed has settled.
+
+    A square's new reading is accepted at once if its confidence margin
+    (see batch_classifier.confidence_margins) is at least `margin`, or once
+    the last `frames` readings of that square agree on it. A new position is
+    committed only when every square that differs from the committed one is
+    accepted. A single flickering square therefore holds the position back,
+    instead of starting an analysis or a resync of a board that was never
+    on screen. frames=1 accepts every reading.
+    """
+
+    def __init__(self, frames=3, margin=0.15):
+        self.frames = frames
+        self.margin = margin
+        self.reset()
+
+    def reset(self, placement=None):
+        """Forgets the reading history and commits `placement` (if given) as the current position."""
+        self.committed = placement
+        self._committed_squares = expand_placement(placement) if placement else None
+        self._history = [deque(maxlen=self.frames) for _ in range(64)]
+        self.pending = []
+
+    def update(self, placement, confidence=None):
+        """Feeds one reading; returns the committed placement, which is unchanged until the new one settles.
+
+        `confidence` holds one margin per square in placement order (a8
+        first). Without it, squares can only be accepted by agreement.
+        """
+        squares = expand_placement(placement) if placement else None
+        if squares is None:
+            return self.committed
+        for history, square in zip(self._history, squares):
+            history.append(square)
+
+        if self._committed_squares is None:
+            changed = range(64)
+        else:
+            changed = [i for i in range(64) if squares[i] != self._committed_squares[i]]
+        self.pending = [i for i in changed if not self._accepted(i, squares[i], confidence)]
+
+        if changed and not self.pending:
+            self.committed = placement
+            self._committed_squares = squares
+            METRICS.incr("stabilizer_commits")
+        elif self.pending:
+            METRICS.incr("stabilizer_held")
+        return self.committed
+
+    def _accepted(self, index, square, confidence):
+        if confidence is not None and confidence[index] >= self.margin:
+            return True
+        history = self._history[index]
+        return len(history) == self.frames and all(seen == square for seen in history)
@@ -0,0 +1,76 @@
+# stub_uci.py - a tiny deterministic UCI engine for benchmarks and headless runs.
+#
+# It searches nothing: every "depth" takes DEPTH_DELAY seconds and reports the
+# first legal moves as its lines. That keeps engine-stage timings about the
+# plumbing (python-chess, streaming, caching) rather than about chess strength.
+
+import sys
+import threading
+import time
+import chess
+
+DEPTH_DELAY = 0.005
+
+board = chess.Board()
+options = {"MultiPV": 1, "Hash": 16, "Threads": 1}
+stop_event = threading.Event()
+search_thread = None
+
+def send(line):
+    sys.stdout.write(line + "\n")
+    sys.stdout.flush()
+
+def search(movetime, max_depth):
+    moves = list(board.legal_moves)[:max(1, options["MultiPV"])]
+    start = time.monotonic()
+    depth = 0
+    while not stop_event.is_set() and depth < max_depth:
+        if movetime is not None and time.monotonic() - start >= movetime:
+            break
+        depth += 1
+        for i, move in enumerate(moves, 1):
+            send(f"info depth {depth} seldepth {depth} multipv {i} score cp {25 - 10 * i} "
+                 f"nodes {depth * 1000} pv {move.uci()}")
+        time.sleep(DEPTH_DELAY)
+    send(f"bestmove {moves[0].uci()}" if moves else "bestmove 0000")
+
+def main():
+    global board, search_thread
+    for line in sys.stdin:
+        tokens = line.split()
+        if not tokens:
+            continue
+        command = tokens[0]
+        if command == "uci":
+            send("id name StubUCI")
+            send("option name MultiPV type spin default 1 min 1 max 500")
+            send("option name Hash type spin default 16 min 1 max 33554432")
+            send("option name Threads type spin default 1 min 1 max 1024")
+            send("uciok")
+        elif command == "isready":
+            send("readyok")
+        elif command == "setoption" and "name" in tokens and "value" in tokens:
+            name = " ".join(tokens[tokens.index("name") + 1:tokens.index("value")])
+            if name in options:
+                options[name] = int(tokens[tokens.index("value") + 1])
+        elif command == "position":
+            moves_at = tokens.index("moves") if "moves" in tokens else len(tokens)
+            board = chess.Board() if tokens[1] == "startpos" else chess.Board(" ".join(tokens[2:moves_at]))
+            for uci in tokens[moves_at + 1:]:
+                board.push_uci(uci)
+        elif command == "go":
+            movetime = int(tokens[tokens.index("movetime") + 1]) / 1000 if "movetime" in tokens else None
+            max_depth = int(tokens[tokens.index("depth") + 1]) if "depth" in tokens else 64
+            stop_event.clear()
+            search_thread = threading.Thread(target=search, args=(movetime, max_depth))
+            search_thread.start()
+        elif command == "stop":
+            stop_event.set()
+            if search_thread:
+                search_thread.join()
+        elif command == "quit":
+            stop_event.set()
+            break
+
+if __name__ == "__main__":
+    main()
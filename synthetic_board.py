@@ -0,0 +1,67 @@
+# synthetic_board.py
+
+import os
+import cv2
+import numpy as np
+import chess
+
+LIGHT_SQUARE = (181, 217, 240)
+DARK_SQUARE = (99, 136, 181)
+HIGHLIGHT = (105, 245, 245)
+
+def load_theme(theme_path):
+    """Loads {piece_code: BGRA image} from a folder of 12 transparent PNGs."""
+    theme = {}
+    for filename in os.listdir(theme_path):
+        if filename.lower().endswith(".png"):
+            img = cv2.imread(os.path.join(theme_path, filename), cv2.IMREAD_UNCHANGED)
+            if img is not None and img.ndim == 3 and img.shape[2] == 4:
+                theme[os.path.splitext(filename)[0]] = img
+    return theme
+
+def render_board(fen, theme, size=480, is_flipped=False, highlights=(), noise=0.0, scale=1.0, seed=0):
+    """
+    Renders the piece placement of a FEN into a BGR board image.
+
+    highlights is a list of square names (e.g. ["e2", "e4"]) tinted like a
+    last-move marker; noise is the standard deviation of Gaussian pixel
+    noise; scale resizes the finished board, as a browser zoom would.
+    """
+    board = chess.BaseBoard(fen.split(' ')[0])
+    square = size // 8
+    img = np.zeros((square * 8, square * 8, 3), dtype=np.uint8)
+    scaled = {code: cv2.resize(piece, (square, square), interpolation=cv2.INTER_AREA) for code, piece in theme.items()}
+    highlighted = {chess.parse_square(name) for name in highlights}
+
+    for r in range(8):
+        for c in range(8):
+            sq = chess.square(7 - c, r) if is_flipped else chess.square(c, 7 - r)
+            colour = LIGHT_SQUARE if (r + c) % 2 == 0 else DARK_SQUARE
+            if sq in highlighted:
+                colour = tuple((np.array(colour) + np.array(HIGHLIGHT)) // 2)
+            cell = img[r*square:(r+1)*square, c*square:(c+1)*square]
+            cell[:] = colour
+            piece = board.piece_at(sq)
+            if piece is None:
+                continue
+            code = ('w' if piece.color == chess.WHITE else 'b') + piece.symbol().upper()
+            sprite = scaled[code]
+            alpha = sprite[:, :, 3:4].astype(np.float32) / 255.0
+            cell[:] = (alpha * sprite[:, :, :3] + (1 - alpha) * cell).astype(np.uint8)
+
+    if noise > 0:
+        rng = np.random.default_rng(seed)
+        img = np.clip(img + rng.normal(0, noise, img.shape), 0, 255).astype(np.uint8)
+    if scale != 1.0:
+        img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+    return img
+
+def render_screen(board_img, screen_size=(1080, 1920), origin=(200, 300), frame=20):
+    """Places a board on a larger desktop-like background, framed like a site's board border."""
+    screen = np.full((screen_size[0], screen_size[1], 3), 48, dtype=np.uint8)
+    screen[::9, :] = 60
+    y, x = origin
+    h, w = board_img.shape[:2]
+    screen[y - frame:y + h + frame, x - frame:x + w + frame] = (30, 30, 30)
+    screen[y:y + h, x:x + w] = board_img
+    return screen, (x, y, w, h)
@@ -0,0 +1,67 @@
+# template_store.py
+
+import cv2
+import logging
+from collections import OrderedDict
+
+class TemplateStore:
+    """Caches piece templates and masks pre-scaled to a given square size.
+
+    With a compiled theme pack loaded, sizes the pack was built for are served
+    straight from its memory map instead of being resized.
+    """
+
+    def __init__(self, max_sizes=4):
+        self.max_sizes = max_sizes
+        self.templates = {}
+        self.masks = {}
+        self._scaled = OrderedDict()
+        self.pack = None
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, piece_code, template, mask):
+        """Registers a full-size template and its mask, invalidating cached scales."""
+        self.templates[piece_code] = template
+        self.masks[piece_code] = mask
+        self.pack = None
+        self._scaled.clear()
+
+    def load_pack(self, pack):
+        """Takes every template from a ThemePack, replacing any added one by one."""
+        self.templates, self.masks = {}, {}
+        for piece_code in pack.codes:
+            self.templates[piece_code], self.masks[piece_code] = pack.template(piece_code)
+        self.pack = pack
+        self._scaled.clear()
+
+    def __len__(self):
+        return len(self.templates)
+
+    def get(self, w, h):
+        """Returns {piece_code: (template, mask)} resized to (w, h), building it once per size."""
+        key = (w, h)
+        scaled = self._scaled.get(key)
+        if scaled is not None:
+            self._scaled.move_to_end(key)
+            self.hits += 1
+            return scaled
+
+        self.misses += 1
+        scaled = self.pack.scaled(w, h) if self.pack is not None else None
+        if scaled is None:
+            scaled = {}
+            for piece_code, template in self.templates.items():
+                resized_template = cv2.resize(template, (w, h), interpolation=cv2.INTER_AREA)
+                resized_mask = cv2.resize(self.masks[piece_code], (w, h), interpolation=cv2.INTER_AREA)
+                scaled[piece_code] = (resized_template, resized_mask)
+        self._scaled[key] = scaled
+        if len(self._scaled) > self.max_sizes:
+            evicted, _ = self._scaled.popitem(last=False)
+            logging.debug(f"Evicted scaled templates for square size {evicted}.")
+        logging.debug(f"Scaled templates built for square size {key}.")
+        return scaled
+
+    def stats(self):
+        """Returns cache counters."""
+        return {"hits": self.hits, "misses": self.misses, "sizes": len(self._scaled)}
@@ -0,0 +1,63 @@
+import cv2
+import numpy as np
+import pytest
+from theme_pack import read_theme
+from template_store import TemplateStore
+from batch_classifier import BatchClassifier, IncrementalClassifier, split_squares
+from synthetic_board import load_theme, render_board
+
+THEME = "pieces/my_pieces"
+
+@pytest.fixture(scope="module")
+def store():
+    store = TemplateStore(max_sizes=4)
+    for code, (bgr, mask) in read_theme(THEME).items():
+        store.add(code, bgr, mask)
+    return store
+
+def match_template_scores(squares, store, codes):
+    """Scores every square against every template the way the per-square cv2 path did."""
+    scaled = store.get(squares.shape[2], squares.shape[1])
+    scores = np.array([[cv2.matchTemplate(np.ascontiguousarray(square), scaled[code][0], cv2.TM_CCOEFF_NORMED,
+                                          mask=scaled[code][1])[0, 0] for code in codes] for square in squares])
+    # OpenCV has no score for a square with no variance under the mask; BatchClassifier gives 0.
+    return np.nan_to_num(scores, nan=0.0, posinf=0.0, neginf=0.0)
+
+@pytest.mark.parametrize("size, noise", [(480, 0.0), (400, 6.0), (560, 0.0)])
+def test_scores_match_cv2_on_synthetic_boards(store, size, noise):
+    board_img = render_board("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R", load_theme(THEME), size,
+                             highlights=("f3", "g1"), noise=noise)
+    squares = split_squares(board_img)
+    codes, scores = BatchClassifier(store).score(squares)
+    np.testing.assert_allclose(scores, match_template_scores(squares, store, codes), atol=0.01)
+
+def test_scores_match_cv2_on_a_screenshot(store):
+    squares = split_squares(cv2.imread("debug_capture.png", cv2.IMREAD_COLOR))
+    codes, scores = BatchClassifier(store).score(squares)
+    np.testing.assert_allclose(scores, match_template_scores(squares, store, codes), atol=0.01)
+
+class CountingClassifier:
+    """Labels every square by its mean brightness and remembers which squares it was asked about."""
+
+    def __init__(self):
+        self.seen = []
+
+    def classify(self, squares, threshold, indices=None):
+        self.seen.append(list(range(len(squares))) if indices is None else list(indices))
+        means = squares.reshape(len(squares), -1).mean(axis=1)
+        return [int(m) for m in means], np.repeat(means[:, None], 2, axis=1).astype(np.float32)
+
+def test_incremental_catches_a_change_made_in_small_steps():
+    inner = CountingClassifier()
+    incremental = IncrementalClassifier(inner, change_threshold=8.0, full_refresh_frames=100)
+    squares = np.zeros((64, 8, 8, 3), dtype=np.uint8)
+    _, first_scores = incremental.classify(squares, 0.5)
+    kept = first_scores.copy()
+
+    # Each frame moves square 5 by less than the threshold, but the steps add up past it.
+    for value in (5, 10):
+        squares[5] = value
+        labels, scores = incremental.classify(squares, 0.5)
+    assert inner.seen[-1] == [5]
+    assert labels[5] == 10
+    np.testing.assert_array_equal(first_scores, kept)
@@ -0,0 +1,34 @@
+import chess
+import numpy as np
+import pytest
+from theme_pack import read_theme
+from template_store import TemplateStore
+from batch_classifier import BatchClassifier, split_squares, confidence_margins
+from cascade_classifier import CascadeClassifier
+from synthetic_board import load_theme, render_board
+
+THEME = "pieces/my_pieces"
+THRESHOLD = 0.7
+E2 = 52
+
+@pytest.fixture(scope="module")
+def cascade():
+    store = TemplateStore(max_sizes=4)
+    for code, (bgr, mask) in read_theme(THEME).items():
+        store.add(code, bgr, mask)
+    cascade = CascadeClassifier(BatchClassifier(store))
+    assert cascade.calibrate(split_squares(render_board(chess.STARTING_BOARD_FEN, load_theme(THEME), 480)))
+    return cascade
+
+def test_empty_margin_shrinks_as_a_piece_fades_in(cascade):
+    theme = load_theme(THEME)
+    with_pawn = split_squares(render_board(chess.STARTING_BOARD_FEN, theme, 480)).astype(np.float32)
+    without = split_squares(render_board("rnbqkbnr/pppppppp/8/8/8/8/PPPP1PPP/RNBQKBNR", theme, 480)).astype(np.float32)
+
+    margins = []
+    for alpha in (0.0, 0.1, 0.2):
+        squares = ((1 - alpha) * without + alpha * with_pawn).astype(np.uint8)
+        labels, scores = cascade.classify(squares, THRESHOLD, range(64))
+        assert labels[E2] is None
+        margins.append(confidence_margins(scores, THRESHOLD)[E2])
+    assert margins[0] > margins[1] > margins[2] > 0
@@ -0,0 +1,67 @@
+import sys
+import threading
+import chess
+import chess.engine
+import pytest
+from analysis import StopConditions
+from pipeline import AnalysisWorker
+
+# A UCI engine that "searches" by streaming the first legal moves depth by depth.
+ENGINE = '''
+import sys, chess
+board, multipv = chess.Board(), 1
+def send(line):
+    sys.stdout.write(line + "\\n")
+    sys.stdout.flush()
+for line in sys.stdin:
+    tokens = line.split()
+    if not tokens:
+        continue
+    if tokens[0] == "uci":
+        send("option name MultiPV type spin default 1 min 1 max 500")
+        send("uciok")
+    elif tokens[0] == "isready":
+        send("readyok")
+    elif tokens[0] == "setoption" and tokens[2] == "MultiPV":
+        multipv = int(tokens[4])
+    elif tokens[0] == "position":
+        at = tokens.index("moves") if "moves" in tokens else len(tokens)
+        board = chess.Board() if tokens[1] == "startpos" else chess.Board(" ".join(tokens[2:at]))
+        for uci in tokens[at + 1:]:
+            board.push_uci(uci)
+    elif tokens[0] == "go":
+        moves = list(board.legal_moves)[:multipv]
+        for depth in range(1, 6):
+            for i, move in enumerate(moves, 1):
+                send(f"info depth {depth} multipv {i} score cp {30 - 10 * i} pv {move.uci()}")
+        send(f"bestmove {moves[0].uci()}")
+    elif tokens[0] == "quit":
+        break
+'''
+
+@pytest.fixture
+def engine(tmp_path):
+    path = tmp_path / "engine.py"
+    path.write_text(ENGINE)
+    engine = chess.engine.SimpleEngine.popen_uci([sys.executable, str(path)])
+    yield engine
+    engine.quit()
+
+def test_worker_delivers_a_search_result(engine):
+    results = []
+    done = threading.Event()
+
+    def on_result(board, info):
+        results.append((board, info))
+        done.set()
+
+    worker = AnalysisWorker(engine, StopConditions(max_time=5.0, max_depth=5), on_result)
+    worker.start()
+    try:
+        worker.submit(chess.Board())
+        assert done.wait(10), "the worker never delivered a result"
+    finally:
+        worker.close()
+    board, info = results[0]
+    assert board.board_fen() == chess.STARTING_BOARD_FEN
+    assert info[0]['pv'][0] in board.legal_moves
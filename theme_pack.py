@@ -0,0 +1,156 @@
+# theme_pack.py - compiles a folder of piece PNGs into one memory-mapped theme pack.
+#
+#   python theme_pack.py pieces/my_pieces/
+#
+# writes pieces/my_pieces.pack.npy next to the folder. The pack holds every
+# template already split into BGR and mask planes, the same planes resized
+# to common square sizes, and the classifier's normalized template bank for
+# each of those sizes. Loading it maps the file instead of decoding PNGs, so
+# only the pages of the sizes actually used are ever read.
+
+import argparse
+import json
+import os
+import logging
+import cv2
+import numpy as np
+
+PACK_VERSION = 2
+# Square sizes in pixels to pre-scale for: boards of roughly 380 to 900 px.
+DEFAULT_SIZES = (48, 56, 64, 72, 80, 88, 96, 104, 112)
+ALIGNMENT = 64
+
+def pack_path(theme_path):
+    """Where the pack for a theme folder lives: next to it, as <folder>.pack.npy."""
+    return os.path.normpath(theme_path) + ".pack.npy"
+
+def read_theme(theme_path):
+    """Decodes {piece_code: (bgr, mask)} from a folder of PNGs. Opaque images get a full mask."""
+    planes = {}
+    for filename in sorted(os.listdir(theme_path)):
+        if not filename.lower().endswith(".png"):
+            continue
+        img = cv2.imread(os.path.join(theme_path, filename), cv2.IMREAD_UNCHANGED)
+        if img is None:
+            logging.warning(f"Could not load template image: {filename}")
+            continue
+        if img.ndim == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        mask = img[:, :, 3] if img.shape[2] == 4 else np.full(img.shape[:2], 255, dtype=np.uint8)
+        planes[os.path.splitext(filename)[0]] = (np.ascontiguousarray(img[:, :, :3]), np.ascontiguousarray(mask))
+    return planes
+
+def compile_theme(theme_path, out_path=None, sizes=DEFAULT_SIZES):
+    """Writes the pack for a theme folder and returns its path."""
+    from template_store import TemplateStore
+    from batch_classifier import BatchClassifier
+
+    planes = read_theme(theme_path)
+    if not planes:
+        raise ValueError(f"No piece templates found in '{theme_path}'.")
+    store = TemplateStore(max_sizes=1)
+    for code, (bgr, mask) in planes.items():
+        store.add(code, bgr, mask)
+    classifier = BatchClassifier(store)
+
+    arrays = {}
+    for code, (bgr, mask) in planes.items():
+        arrays[f"full/{code}/bgr"], arrays[f"full/{code}/mask"] = bgr, mask
+    for size in sizes:
+        key = f"{size}x{size}"
+        for code, (bgr, mask) in store.get(size, size).items():
+            arrays[f"{key}/{code}/bgr"], arrays[f"{key}/{code}/mask"] = bgr, mask
+        _, weights, weight_sums, projection, template_var = classifier._build_bank(size, size)
+        arrays[f"{key}/bank/weights"] = weights
+        arrays[f"{key}/bank/weight_sums"] = weight_sums
+        arrays[f"{key}/bank/projection"] = projection
+        arrays[f"{key}/bank/template_var"] = template_var
+
+    # Layout: 8-byte index length, JSON index, then every array on a 64-byte boundary.
+    index = {"version": PACK_VERSION, "codes": sorted(planes), "sizes": list(sizes), "arrays": {}}
+    offset = 0
+    for name, array in arrays.items():
+        index["arrays"][name] = [offset, list(array.shape), array.dtype.str]
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header = json.dumps(index).encode()
+    start = -(-(8 + len(header)) // ALIGNMENT) * ALIGNMENT
+    blob = np.zeros(start + offset, dtype=np.uint8)
+    blob[:8] = np.frombuffer(np.uint64(len(header)).tobytes(), dtype=np.uint8)
+    blob[8:8 + len(header)] = np.frombuffer(header, dtype=np.uint8)
+    for name, array in arrays.items():
+        at = start + index["arrays"][name][0]
+        blob[at:at + array.nbytes] = np.frombuffer(np.ascontiguousarray(array).tobytes(), dtype=np.uint8)
+
+    out_path = out_path or pack_path(theme_path)
+    np.save(out_path, blob)
+    logging.info(f"Theme pack written: {out_path} ({blob.nbytes / 1e6:.1f} MB, {len(planes)} pieces, "
+                 f"{len(sizes)} sizes).")
+    return out_path
+
+class ThemePack:
+    """Read-only view of a compiled theme pack; every array is a slice of one memory map."""
+
+    def __init__(self, path):
+        self.blob = np.load(path, mmap_mode='r')
+        length = int(np.frombuffer(self.blob[:8].tobytes(), dtype=np.uint64)[0])
+        index = json.loads(self.blob[8:8 + length].tobytes())
+        if index.get("version") != PACK_VERSION:
+            raise ValueError(f"Unsupported theme pack version in '{path}'.")
+        self.codes = index["codes"]
+        self.sizes = {(s, s) for s in index["sizes"]}
+        self._start = -(-(8 + length) // ALIGNMENT) * ALIGNMENT
+        self._arrays = index["arrays"]
+
+    def _array(self, name):
+        offset, shape, dtype = self._arrays[name]
+        dtype = np.dtype(dtype)
+        at = self._start + offset
+        count = int(np.prod(shape))
+        return self.blob[at:at + count * dtype.itemsize].view(dtype).reshape(shape)
+
+    def template(self, code):
+        """Full-size (bgr, mask) planes of a piece."""
+        return self._array(f"full/{code}/bgr"), self._array(f"full/{code}/mask")
+
+    def scaled(self, w, h):
+        """{piece_code: (bgr, mask)} pre-scaled to (w, h), or None if the pack lacks that size."""
+        if (w, h) not in self.sizes:
+            return None
+        return {code: (self._array(f"{w}x{h}/{code}/bgr"), self._array(f"{w}x{h}/{code}/mask"))
+                for code in self.codes}
+
+    def bank(self, w, h):
+        """The classifier's template bank for (w, h), in BatchClassifier's layout, or None."""
+        if (w, h) not in self.sizes:
+            return None
+        key = f"{w}x{h}/bank"
+        return (list(self.codes), self._array(f"{key}/weights"), self._array(f"{key}/weight_sums"),
+                self._array(f"{key}/projection"), self._array(f"{key}/template_var"))
+
+def load_pack(theme_path):
+    """Opens the pack compiled from a theme folder if it exists and is newer than every PNG in it."""
+    path = pack_path(theme_path)
+    if not os.path.exists(path):
+        return None
+    built = os.path.getmtime(path)
+    if any(os.path.getmtime(os.path.join(theme_path, f)) > built
+           for f in os.listdir(theme_path) if f.lower().endswith(".png")):
+        logging.warning(f"Theme pack '{path}' is older than its PNGs; recompile it. Loading the PNGs instead.")
+        return None
+    try:
+        return ThemePack(path)
+    except Exception as e:
+        logging.error(f"Could not load theme pack '{path}': {e}")
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile a folder of piece PNGs into a theme pack.")
+    parser.add_argument("theme", help="folder of 12 piece PNGs, e.g. pieces/my_pieces/")
+    parser.add_argument("-o", "--output", help="pack file (default: <folder>.pack.npy)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="square sizes to pre-scale")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    compile_theme(args.theme, args.output, args.sizes)
+
+if __name__ == "__main__":
+    main()
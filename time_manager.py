@@ -0,0 +1,50 @@
+# time_manager.py
+
+from analysis import StopConditions
+
+class TimeManager:
+    """Picks the stop conditions for each position instead of one fixed think time.
+
+    `base.max_time` is the normal budget. With a single legal move only a
+    short search (forced_time seconds, at most min_depth deep) is run, so its
+    eval can still be shown. With at most few_moves legal moves, e.g. a check
+    or a forced recapture, the budget is halved. Every other position keeps
+    the whole budget as its soft time. It may run on to `extend` times the
+    budget while the best move or eval is still changing, and it ends early
+    once one move clearly stands out (see StopConditions).
+
+    for_board() may be given the number of seconds left on the player's
+    clock (see clock.py), read along with the board. No search is then
+    allowed more than clock_fraction of it, and none less than forced_time.
+
+    A TimeManager can be passed anywhere a StopConditions is expected.
+    """
+
+    def __init__(self, base, forced_time=0.1, few_moves=4, extend=2.5, clear_gap=150, unstable_margin=40,
+                 clock_fraction=0.05):
+        self.base = base
+        self.forced_time = forced_time
+        self.few_moves = few_moves
+        self.extend = extend
+        self.clear_gap = clear_gap
+        self.unstable_margin = unstable_margin
+        self.clock_fraction = clock_fraction
+
+    def for_board(self, board, clock=None):
+        """The stop conditions for this position, with `clock` seconds left if known."""
+        base = self.base
+        if base.max_time is None:
+            return base
+        legal = board.legal_moves.count()
+        if legal <= 1:
+            return StopConditions(max_time=min(self.forced_time, base.max_time), max_depth=base.min_depth)
+
+        budget = base.max_time
+        if legal <= self.few_moves:
+            budget /= 2
+        hard = budget * self.extend
+        if clock is not None:
+            hard = max(min(hard, clock * self.clock_fraction), self.forced_time)
+            budget = min(budget, hard)
+        return StopConditions(hard, base.max_depth, base.stable_iterations, base.stable_margin, base.min_depth,
+                              soft_time=budget, clear_gap=self.clear_gap, unstable_margin=self.unstable_margin)